@@ -1,11 +1,17 @@
-import whisper
-import sqlite3
 from fuzzywuzzy import fuzz
 from compare import compare_texts
+from transcript_cache import cached_transcribe, audio_sha256
+from model_registry import get_model
+import db
+import timings
 import os
 
 # Sabit test klasörünün yolu
 TEST_DIR = "/Users/yagizcetin/Downloads/test"
+MODEL_NAME = "large"
+# ör. "base": large'ın greedy çıktısı, küçük modelin taslaklarıyla daha az
+# large decoder çağrısıyla üretilir (bkz. speculative.py). None = normal transcribe
+SPECULATIVE_DRAFT = None
 
 def get_audio_path(filename: str) -> str:
     """Test klasöründen dosya yolu döndürür"""
@@ -16,10 +22,17 @@ def speech():
     # ==============================
     # 4. RECORDINGLERİ TEST ETME
     # ==============================
-    conn = sqlite3.connect("speech_eval_small.db")
-    c = conn.cursor()
+    c = db.get_connection("speech_eval_small.db").cursor()
 
-    model = whisper.load_model("large")
+    # model sadece cache'te olmayan bir dosya geldiğinde (bir kez) yüklenir
+    def model():
+        if SPECULATIVE_DRAFT:
+            from speculative import SpeculativeModel
+            return SpeculativeModel(get_model(MODEL_NAME), get_model(SPECULATIVE_DRAFT))
+        return get_model(MODEL_NAME)
+
+    # speculative çıktı greedy'dir, transcribe() sonucuyla aynı cache anahtarını paylaşmaz
+    cache_name = MODEL_NAME + (".speculative" if SPECULATIVE_DRAFT else "")
 
     # recording1.mp3 → prompt_id 1, recording2.mp3 → prompt_id 2 ...
     for prompt_id in range(1, 11):
@@ -27,31 +40,42 @@ def speech():
         audio_file = get_audio_path(p_id)
         print("Path:", audio_file)
         print("Var mı?", os.path.exists(audio_file))
+        timer = timings.StageTimer()
         try:
-            # Ses dosyasını çözümle
-            result = model.transcribe(audio_file, language="en")
-            user_text = result["text"]
-            print (user_text)
-
-            # DB’den hedef cümleyi çek
-            c.execute("SELECT expected_text FROM prompts WHERE id = ?", (prompt_id,))
-            target = c.fetchone()[0]
-
-            # Kıyaslama
-            cmp = compare_texts(target, user_text)
-
-            # DB’ye kaydet
-            c.execute("""INSERT INTO recordings
-                (prompt_id, file_path, recognized_text, score, ratio, partial, token_sort, passed, feedback)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (prompt_id, audio_file, user_text, cmp["score"], cmp["ratio"],
-                 cmp["partial"], cmp["token_sort"], cmp["passed"], cmp["feedback"]))
-            conn.commit()
+            with timer.active():
+                # Ses dosyasını çözümle (aynı dosya daha önce çözüldüyse cache'ten gelir)
+                # hash bir kez: hem transcript cache anahtarı hem DB kolonu
+                with timer.stage("cache_lookup"):
+                    audio_hash = audio_sha256(audio_file)
+                result = cached_transcribe(model, cache_name, audio_file,
+                                           audio_hash=audio_hash, language="en")
+                user_text = result["text"]
+                print (user_text)
+
+                # DB’den hedef cümleyi çek
+                with timer.stage("prompt_lookup"):
+                    c.execute("SELECT expected_text FROM prompts WHERE id = ?", (prompt_id,))
+                    target = c.fetchone()[0]
+
+                # Kıyaslama
+                with timer.stage("compare"):
+                    cmp = compare_texts(target, user_text)
+
+                # DB’ye kaydet (created_at + ses hash'i ile, tek yazar kuyruğu üzerinden)
+                with timer.stage("db_enqueue"):
+                    saved = db.insert_recording("speech_eval_small.db", dict(
+                        prompt_id=prompt_id, file_path=audio_file, recognized_text=user_text,
+                        score=cmp["score"], ratio=cmp["ratio"], partial=cmp["partial"],
+                        token_sort=cmp["token_sort"], passed=cmp["passed"],
+                        feedback=cmp["feedback"], audio_sha256=audio_hash))
+            # db_enqueue kapandıktan sonraki anlık görüntü: timings tablosuna da girer
+            db.attach_timings("speech_eval_small.db", saved, timer.as_ms())
 
             print(f"[OK] Prompt {prompt_id}")
             print("Beklenen   :", target)
             print("Kullanıcı :", user_text)
             print("Sonuç     :", cmp)
+            print("Süreler ms:", timer.as_ms())
             print("-" * 40)
 
         except Exception as e:
@@ -59,4 +83,4 @@ def speech():
             print("Gerçek hata:", repr(e))
             continue
 
-    conn.close()
+    db.flush_all()
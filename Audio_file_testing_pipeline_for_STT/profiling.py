@@ -0,0 +1,149 @@
+"""
+İsteğe bağlı profil çıkarma.
+
+Sahadaki yavaş bir record_and_evaluate'i incelemek için script'i elle
+düzenlemek gerekmesin: bir ortam değişkeni ya da CLI bayrağı komutu
+cProfile, tracemalloc ve/veya torch profiler ile sarar.
+
+    CLEARCOMS_PROFILE=cprofile,tracemalloc python communications_backend.py record_and_evaluate 3
+    python communications_backend.py --profile=torch --profile-dir /tmp/prof record_and_evaluate 3
+    python batch_eval.py --glob "test/*.mp3" --profile cprofile
+
+Çıktılar PROFILE_DIR'e <komut>-<zaman>-<pid>.* adıyla yazılır:
+    .prof                cProfile (snakeviz / pstats ile açılır)
+    .pstats.txt          kümülatif süreye göre ilk satırlar
+    .tracemalloc.txt     en çok bellek ayıran satırlar + tepe kullanım
+    .torch.json          chrome://tracing / Perfetto izi
+    .torch.txt           operatör bazında özet tablo
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+
+MODES = ("cprofile", "tracemalloc", "torch")
+ENV_MODES = "CLEARCOMS_PROFILE"
+ENV_DIR = "CLEARCOMS_PROFILE_DIR"
+PROFILE_DIR = os.environ.get(ENV_DIR) or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "profiles")
+TOP_N = 40
+
+
+def parse_modes(value: str | None) -> tuple:
+    """"cprofile,torch" -> ("cprofile", "torch"); "1" -> sadece cprofile; "all" -> hepsi."""
+    if not value or value.strip().lower() in ("0", "false", "off"):
+        return ()
+    value = value.strip().lower()
+    if value in ("1", "true", "on"):
+        return ("cprofile",)
+    if value == "all":
+        return MODES
+    modes = tuple(m.strip() for m in value.split(",") if m.strip())
+    unknown = [m for m in modes if m not in MODES]
+    if unknown:
+        raise ValueError(f"unknown profile mode(s): {', '.join(unknown)} (choose from {', '.join(MODES)})")
+    return modes
+
+
+def env_modes() -> tuple:
+    return parse_modes(os.environ.get(ENV_MODES))
+
+
+def pop_cli_args(argv: list):
+    """
+    argv'den --profile[=modlar] ve --profile-dir DIR bayraklarını çıkarır.
+    -> (kalan argv, modlar, klasör). Bayrak yoksa ortam değişkenleri geçerli.
+    """
+    rest, modes, out_dir = [], env_modes(), None
+    args = iter(argv)
+    for arg in args:
+        if arg == "--profile":
+            modes = ("cprofile",)
+        elif arg.startswith("--profile="):
+            modes = parse_modes(arg.split("=", 1)[1])
+        elif arg == "--profile-dir":
+            out_dir = next(args, None)
+        elif arg.startswith("--profile-dir="):
+            out_dir = arg.split("=", 1)[1]
+        else:
+            rest.append(arg)
+    return rest, modes, out_dir
+
+
+def _artifact_base(command: str, out_dir: str) -> str:
+    os.makedirs(out_dir, exist_ok=True)
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in command) or "command"
+    now = time.time()
+    # aynı saniyede birden fazla istek/dosya profillenebilir (serve, batch worker)
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f"{int(now * 1000) % 1000:03d}"
+    return os.path.join(out_dir, f"{safe}-{stamp}-{os.getpid()}")
+
+
+@contextmanager
+def profiled(command: str, modes: tuple | None = None, out_dir: str | None = None):
+    """
+    Blok içini seçilen profiler'larla çalıştırır, çıkışta dosyaları yazar.
+    modes boşsa hiçbir şey yapmaz. Yazılan dosya yolları listesi yield edilir
+    (blok bittiğinde doldurulur) ve stderr'e basılır; stdout'taki JSON bozulmaz.
+    """
+    modes = env_modes() if modes is None else modes
+    artifacts = []
+    if not modes:
+        yield artifacts
+        return
+
+    base = _artifact_base(command, out_dir or PROFILE_DIR)
+    profiler = torch_prof = None
+
+    if "torch" in modes:
+        import torch
+        from torch.profiler import ProfilerActivity, profile
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+        torch_prof = profile(activities=activities, record_shapes=True, profile_memory=True)
+        torch_prof.__enter__()
+    # torch import'u izlenmesin diye torch profiler'dan sonra başlar
+    if "tracemalloc" in modes:
+        import tracemalloc
+        tracemalloc.start(25)
+    if "cprofile" in modes:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        yield artifacts
+    finally:
+        # başlatma sırasının tersiyle kapatılır
+        if profiler is not None:
+            import io
+            import pstats
+            profiler.disable()
+            profiler.dump_stats(base + ".prof")
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(TOP_N)
+            _write(base + ".pstats.txt", text.getvalue())
+            artifacts += [base + ".prof", base + ".pstats.txt"]
+        if "tracemalloc" in modes:
+            import tracemalloc
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            lines = [f"current: {current / 1e6:.1f} MB, peak: {peak / 1e6:.1f} MB", ""]
+            lines += [str(stat) for stat in snapshot.statistics("lineno")[:TOP_N]]
+            _write(base + ".tracemalloc.txt", "\n".join(lines) + "\n")
+            artifacts.append(base + ".tracemalloc.txt")
+        if torch_prof is not None:
+            torch_prof.__exit__(None, None, None)
+            torch_prof.export_chrome_trace(base + ".torch.json")
+            _write(base + ".torch.txt", torch_prof.key_averages().table(
+                sort_by="self_cpu_time_total", row_limit=TOP_N))
+            artifacts += [base + ".torch.json", base + ".torch.txt"]
+        print(f"[profile] {command}: " + ", ".join(artifacts), file=sys.stderr)
+
+
+def _write(path: str, text: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
@@ -1,4 +1,5 @@
-﻿using System.Diagnostics;
+﻿using System.Collections.Concurrent;
+using System.Diagnostics;
 using System.Text.Json;
 using System.IO;
 
@@ -9,6 +10,24 @@ namespace ClearComs.Services
         private readonly string _pythonPath;
         private readonly string _scriptPath;
 
+        // serve modunda açık kalan python süreci (Whisper modeli bellekte kalır)
+        private Process? _serveProcess;
+        private TaskCompletionSource<bool>? _serveReady;
+        private readonly SemaphoreSlim _serveLock = new(1, 1);
+        private readonly ConcurrentDictionary<int, TaskCompletionSource<Dictionary<string, object>?>> _pending = new();
+        private int _nextRequestId;
+
+        /// <summary>
+        /// "stream" ile gönderilen kayıt isteklerinde, final sonuçtan önce gelen
+        /// kısmi transkripsiyonlar (partial_text, score). Arka plan thread'inden çağrılır.
+        /// </summary>
+        public event Action<Dictionary<string, object>>? PartialResultReceived;
+
+        private static readonly JsonSerializerOptions JsonOptions = new()
+        {
+            PropertyNameCaseInsensitive = true
+        };
+
         public PythonBackendService()
         {
             // 1) Python çalıştırıcı yolu
@@ -42,8 +61,10 @@ namespace ClearComs.Services
 
         /// <summary>
         /// Python scriptine komut gönderir, çıktıyı JSON olarak geri döndürür.
+        /// Komutlar uzun ömürlü "serve" sürecine gider; süreç başlatılamazsa
+        /// eski tek seferlik process yoluna düşer.
         /// </summary>
-        public async Task<Dictionary<string, object>?> RunBackendAsync(string command, int promptId)
+        public async Task<Dictionary<string, object>?> RunBackendAsync(string command, int promptId, bool stream = false)
         {
             if (!File.Exists(_scriptPath))
             {
@@ -52,6 +73,152 @@ namespace ClearComs.Services
                 );
             }
 
+            try
+            {
+                await EnsureServeProcessAsync();
+            }
+            catch (Exception ex)
+            {
+                Debug.WriteLine("[PY] serve mode unavailable: " + ex.Message);
+                return await RunOneShotAsync(command, promptId);
+            }
+
+            var id = Interlocked.Increment(ref _nextRequestId);
+            var tcs = new TaskCompletionSource<Dictionary<string, object>?>(TaskCreationOptions.RunContinuationsAsynchronously);
+            _pending[id] = tcs;
+
+            var request = JsonSerializer.Serialize(new Dictionary<string, object>
+            {
+                ["id"] = id,
+                ["command"] = command,
+                ["prompt_id"] = promptId,
+                ["stream"] = stream
+            });
+
+            await _serveLock.WaitAsync();
+            try
+            {
+                await _serveProcess!.StandardInput.WriteLineAsync(request);
+                await _serveProcess.StandardInput.FlushAsync();
+            }
+            catch (Exception ex)
+            {
+                _pending.TryRemove(id, out _);
+                Debug.WriteLine("[PY] serve write failed: " + ex.Message);
+                return await RunOneShotAsync(command, promptId);
+            }
+            finally
+            {
+                _serveLock.Release();
+            }
+
+            return await tcs.Task;
+        }
+
+        private async Task EnsureServeProcessAsync()
+        {
+            await _serveLock.WaitAsync();
+            try
+            {
+                if (_serveProcess != null && !_serveProcess.HasExited)
+                    return;
+
+                var psi = new ProcessStartInfo
+                {
+                    FileName = _pythonPath,
+                    Arguments = $"\"{_scriptPath}\" serve",
+                    RedirectStandardInput = true,
+                    RedirectStandardOutput = true,
+                    RedirectStandardError = true,
+                    UseShellExecute = false,
+                    CreateNoWindow = true
+                };
+
+                var process = new Process { StartInfo = psi, EnableRaisingEvents = true };
+                _serveReady = new TaskCompletionSource<bool>(TaskCreationOptions.RunContinuationsAsynchronously);
+
+                process.OutputDataReceived += (_, e) => OnServeOutput(e.Data);
+                process.ErrorDataReceived += (_, e) =>
+                {
+                    if (e.Data != null)
+                        Debug.WriteLine("PYTHON ERR: " + e.Data);
+                };
+                process.Exited += (_, _) => OnServeExited();
+
+                process.Start();
+                process.BeginOutputReadLine();
+                process.BeginErrorReadLine();
+                _serveProcess = process;
+            }
+            finally
+            {
+                _serveLock.Release();
+            }
+
+            // model yüklenene kadar ilk "ready" satırını bekle
+            if (!await _serveReady.Task)
+                throw new InvalidOperationException("Python serve process exited during startup.");
+        }
+
+        private void OnServeOutput(string? line)
+        {
+            if (string.IsNullOrWhiteSpace(line))
+                return;
+
+            Debug.WriteLine("PYTHON OUT: " + line);
+
+            Dictionary<string, object>? result;
+            try
+            {
+                result = JsonSerializer.Deserialize<Dictionary<string, object>>(line, JsonOptions);
+            }
+            catch (Exception ex)
+            {
+                Debug.WriteLine("JSON Parse Error: " + ex.Message);
+                return;
+            }
+
+            if (result == null)
+                return;
+
+            if (result.ContainsKey("ready"))
+            {
+                _serveReady?.TrySetResult(true);
+                return;
+            }
+
+            if (result.TryGetValue("is_partial", out var partialObj)
+                && partialObj is JsonElement partialElem
+                && partialElem.ValueKind == JsonValueKind.True)
+            {
+                PartialResultReceived?.Invoke(result);
+                return;
+            }
+
+            if (result.TryGetValue("id", out var idObj)
+                && idObj is JsonElement idElem
+                && idElem.ValueKind == JsonValueKind.Number
+                && _pending.TryRemove(idElem.GetInt32(), out var tcs))
+            {
+                tcs.TrySetResult(result);
+            }
+        }
+
+        private void OnServeExited()
+        {
+            Debug.WriteLine("[PY] serve process exited");
+            _serveReady?.TrySetResult(false);
+
+            // bekleyen istekler boşta kalmasın
+            foreach (var id in _pending.Keys)
+            {
+                if (_pending.TryRemove(id, out var tcs))
+                    tcs.TrySetResult(null);
+            }
+        }
+
+        private async Task<Dictionary<string, object>?> RunOneShotAsync(string command, int promptId)
+        {
             var psi = new ProcessStartInfo
             {
                 FileName = _pythonPath,
@@ -80,12 +247,7 @@ namespace ClearComs.Services
 
             try
             {
-                var options = new JsonSerializerOptions
-                {
-                    PropertyNameCaseInsensitive = true
-                };
-
-                var result = JsonSerializer.Deserialize<Dictionary<string, object>>(output, options);
+                var result = JsonSerializer.Deserialize<Dictionary<string, object>>(output, JsonOptions);
                 return result;
             }
             catch (Exception ex)
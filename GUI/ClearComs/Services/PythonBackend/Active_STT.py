@@ -1,37 +1,50 @@
-import whisper
-import sqlite3
 from fuzzywuzzy import fuzz
 from compare import compare_texts
+from transcript_cache import cached_transcribe, audio_sha256
+from model_registry import get_model
+import db
+import timings
 import os
 
+STT_MODEL_NAME = "small"
+
 def speech(x,prompt_id):
     # ==============================
     # 4. RECORDINGLERİ TEST ETME
     # ==============================
-    conn = sqlite3.connect("speech_eval_small.db")
-    c = conn.cursor()
+    c = db.get_connection("speech_eval_small.db").cursor()
+    timer = timings.StageTimer()
 
-    model = whisper.load_model("small")
     audio_file=x
-    # Ses dosyasını çözümle
-    result = model.transcribe(audio_file, language="en")
-    user_text = result["text"]
-    print (user_text)
-
-    # DB’den hedef cümleyi çek
-    c.execute("SELECT expected_text FROM prompts WHERE id = ?", (prompt_id,))
-    target = c.fetchone()[0]
-
-    # Kıyaslama
-    cmp = compare_texts(target, user_text)
-
-    # DB’ye kaydet
-    c.execute("""INSERT INTO recordings
-           (prompt_id, file_path, recognized_text, score, ratio, partial, token_sort, passed, feedback)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-        (prompt_id, audio_file, user_text, cmp["score"], cmp["ratio"],
-         cmp["partial"], cmp["token_sort"], cmp["passed"], cmp["feedback"]))
-    conn.commit()
+    with timer.active():
+        # Ses dosyasını çözümle (aynı kayıt daha önce çözüldüyse cache'ten gelir,
+        # o durumda model hiç yüklenmez). Model process başına bir kez yüklenir.
+        with timer.stage("cache_lookup"):
+            audio_hash = audio_sha256(audio_file)
+        result = cached_transcribe(lambda: get_model(STT_MODEL_NAME), STT_MODEL_NAME,
+                                   audio_file, audio_hash=audio_hash, language="en")
+        user_text = result["text"]
+        print (user_text)
+
+        # DB’den hedef cümleyi çek
+        with timer.stage("prompt_lookup"):
+            c.execute("SELECT expected_text FROM prompts WHERE id = ?", (prompt_id,))
+            target = c.fetchone()[0]
+
+        # Kıyaslama
+        with timer.stage("compare"):
+            cmp = compare_texts(target, user_text)
+
+        # DB’ye kaydet (tek yazar kuyruğu üzerinden)
+        with timer.stage("db_enqueue"):
+            saved = db.insert_recording("speech_eval_small.db", dict(
+                prompt_id=prompt_id, file_path=audio_file, recognized_text=user_text,
+                score=cmp["score"], ratio=cmp["ratio"], partial=cmp["partial"],
+                token_sort=cmp["token_sort"], passed=cmp["passed"], feedback=cmp["feedback"],
+                audio_sha256=audio_hash))
+    # db_enqueue kapandıktan sonraki anlık görüntü: timings tablosuna da girer
+    result["timings_ms"] = timer.as_ms()
+    db.attach_timings("speech_eval_small.db", saved, result["timings_ms"])
 
     print(f"[OK] Prompt {prompt_id}")
     print("Beklenen   :", target)
@@ -39,6 +52,3 @@ def speech(x,prompt_id):
     print("Sonuç     :", cmp)
     print("-" * 40)
     return result
-
-
-    conn.close()
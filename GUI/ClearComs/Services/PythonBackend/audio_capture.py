@@ -0,0 +1,132 @@
+"""
+Mikrofon kaydı yardımcıları.
+
+- Sessizlikte duran kayıt (enerji tabanlı VAD): sabit RECORD_SECONDS yerine
+  sounddevice InputStream'den blok blok okur, konuşma başladıktan sonra
+  belirli bir süre sessizlik gelince kaydı bitirir. Baştaki sessizlik kırpılır,
+  kısa bir pre-roll bırakılır.
+- Whisper'ın beklediği 16 kHz mono float32 formata bellek içinde dönüşüm,
+  böylece geçici WAV + ffmpeg turuna gerek kalmaz.
+"""
+import threading
+from math import gcd
+
+import numpy as np
+import sounddevice as sd
+from scipy.io.wavfile import write as wav_write
+from scipy.signal import resample_poly
+
+
+MAX_RECORD_SECONDS = 15.0        # üst sınır, uzun clearance'lar kesilmesin
+TRAILING_SILENCE_SECONDS = 0.8   # konuşmadan sonra bu kadar sessizlik -> dur
+MIN_SPEECH_SECONDS = 0.15        # bundan kısa ses patlamaları konuşma sayılmaz
+PRE_ROLL_SECONDS = 0.25          # konuşma başlangıcından önce bırakılan kısım
+CALIBRATE_SECONDS = 0.2          # ortam gürültüsünü ölçme süresi
+BLOCK_MS = 30
+MIN_ENERGY = 400                 # int16 RMS, sessiz odada eşik bunun altına inmez
+NOISE_FACTOR = 3.0
+WHISPER_SAMPLE_RATE = 16000
+
+
+def block_rms(block: np.ndarray) -> float:
+    return float(np.sqrt(np.mean(block.astype(np.float32) ** 2)))
+
+
+def record_until_silence(samplerate: int = 44100,
+                         max_seconds: float = MAX_RECORD_SECONDS,
+                         silence_seconds: float = TRAILING_SILENCE_SECONDS,
+                         threshold: float | None = None,
+                         on_block=None) -> np.ndarray:
+    """
+    Mikrofondan mono int16 kayıt alır ve (n, 1) şeklinde dizi döndürür.
+    threshold verilmezse ilk CALIBRATE_SECONDS içindeki gürültüden hesaplanır.
+    Hiç konuşma algılanmazsa max_seconds boyunca kaydedilen her şey döner.
+    on_block(block, speaking) verilirse her blok okunur okunmaz çağrılır
+    (canlı transkripsiyon için); speaking, konuşma başlamış ve hâlâ sürüyor demektir.
+    """
+    block = max(1, int(samplerate * BLOCK_MS / 1000))
+    max_blocks = int(max_seconds * 1000 / BLOCK_MS)
+    silence_blocks = max(1, int(silence_seconds * 1000 / BLOCK_MS))
+    min_speech_blocks = max(1, int(MIN_SPEECH_SECONDS * 1000 / BLOCK_MS))
+    calibrate_blocks = int(CALIBRATE_SECONDS * 1000 / BLOCK_MS)
+    pre_roll_blocks = int(PRE_ROLL_SECONDS * 1000 / BLOCK_MS)
+
+    blocks = []
+    levels = []
+    speech_start = None
+    voiced_run = 0
+    silent_run = 0
+
+    with sd.InputStream(samplerate=samplerate, channels=1,
+                        dtype="int16", blocksize=block) as stream:
+        while len(blocks) < max_blocks:
+            data, _overflowed = stream.read(block)
+            blocks.append(data.copy())
+            level = block_rms(data)
+            levels.append(level)
+
+            if threshold is None and len(levels) == calibrate_blocks:
+                threshold = max(MIN_ENERGY, float(np.median(levels)) * NOISE_FACTOR)
+            current = threshold if threshold is not None else MIN_ENERGY
+
+            if level >= current:
+                voiced_run += 1
+                silent_run = 0
+                if speech_start is None and voiced_run >= min_speech_blocks:
+                    speech_start = len(blocks) - voiced_run
+            else:
+                voiced_run = 0
+                silent_run += 1
+
+            if on_block is not None:
+                on_block(data, speech_start is not None and silent_run == 0)
+            if speech_start is not None and silent_run >= silence_blocks:
+                break
+
+    if speech_start is None:
+        return np.concatenate(blocks)
+
+    start = max(0, speech_start - pre_roll_blocks)
+    # sondaki sessizliğin çoğunu at, kelime sonu kesilmesin diye biraz bırak
+    end = len(blocks) - max(0, silent_run - pre_roll_blocks)
+    return np.concatenate(blocks[start:end])
+
+
+def capture_rate(preferred: int = WHISPER_SAMPLE_RATE, fallback: int = 44100) -> int:
+    """Cihaz 16 kHz'i doğrudan destekliyorsa onu, yoksa fallback'i döndürür."""
+    try:
+        sd.check_input_settings(samplerate=preferred, channels=1, dtype="int16")
+        return preferred
+    except Exception:
+        return fallback
+
+
+def to_whisper_audio(data: np.ndarray, samplerate: int) -> np.ndarray:
+    """
+    Kaydı (ya da wavfile.read çıktısını) Whisper girişi olan 16 kHz mono
+    float32 diziye çevirir. Tamsayı PCM [-1, 1]'e ölçeklenir: int16/int32
+    (24 bit dahil, scipy sola hizalar) tam ölçeğe, 8 bit uint8 128 ofsetiyle.
+    """
+    audio = np.asarray(data)
+    if audio.dtype == np.uint8:
+        audio = (audio.astype(np.float32) - 128.0) / 128.0
+    elif np.issubdtype(audio.dtype, np.signedinteger):
+        audio = audio.astype(np.float32) / float(-np.iinfo(audio.dtype).min)
+    else:
+        audio = audio.astype(np.float32)
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1)
+    if samplerate != WHISPER_SAMPLE_RATE:
+        g = gcd(int(samplerate), WHISPER_SAMPLE_RATE)
+        audio = resample_poly(audio, WHISPER_SAMPLE_RATE // g, int(samplerate) // g).astype(np.float32)
+    return audio
+
+
+def save_wav_async(path: str, samplerate: int, data: np.ndarray) -> threading.Thread:
+    """
+    Kaydı arka planda diske yazar; değerlendirme yazmayı beklemez.
+    Daemon değil: tek seferlik CLI çıkarken yazma yarım kalmasın.
+    """
+    thread = threading.Thread(target=wav_write, args=(path, samplerate, data))
+    thread.start()
+    return thread
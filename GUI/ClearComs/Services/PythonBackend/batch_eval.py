@@ -0,0 +1,257 @@
+"""
+Toplu (batch) değerlendirme.
+
+STT.speech() gibi sabit bir klasörü tek tek gezmek yerine bir glob ya da
+manifest'teki tüm kayıtları bir process havuzunda çözer. Her worker modeli
+bir kez yükler; sonuçlar ana process'te compare_texts'ten geçip parça parça
+tek transaction'da recordings tablosuna yazılır.
+
+Yarıda kalan çalışma kaldığı yerden devam eder: ses içeriğinin sha256'sı
+ve prompt_id'si recordings'te zaten olan dosyalar atlanır (--force hariç).
+
+Kullanım:
+    python batch_eval.py --glob "test/rec*.m4a"
+    python batch_eval.py --manifest manifest.csv --model small --workers 4
+    python batch_eval.py --glob "test/*.mp3" --model small --dtype int8   # CPU
+
+Manifest: "file,prompt_id" başlıklı CSV ya da
+[{"file": "...", "prompt_id": 3}, ...] şeklinde JSON. Göreli yollar
+manifest dosyasının klasörüne göre çözülür. --glob ile prompt_id dosya
+adındaki sayıdan alınır (rec7.m4a -> 7).
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import db
+import profiling
+import timings
+from compare import compare_texts
+from transcript_cache import audio_sha256
+
+
+DEFAULT_DB = "speech_eval_small.db"
+DEFAULT_MODEL = "large"
+DEFAULT_WORKERS = max(1, min(4, (os.cpu_count() or 2) // 2))
+COMMIT_EVERY = 50                       # bu kadar sonuçta bir toplu yazılır
+PROMPT_ID_PATTERN = r"(\d+)(?!.*\d)"    # dosya adındaki son sayı
+
+
+# =========================
+# inputs
+# =========================
+def jobs_from_glob(pattern: str, prompt_pattern: str = PROMPT_ID_PATTERN) -> list:
+    jobs = []
+    for path in sorted(glob.glob(pattern)):
+        name = os.path.splitext(os.path.basename(path))[0]
+        m = re.search(prompt_pattern, name)
+        if m is None:
+            print(f"[ATLANDI] prompt_id bulunamadı: {path}", file=sys.stderr)
+            continue
+        jobs.append((os.path.abspath(path), int(m.group(1))))
+    return jobs
+
+
+def jobs_from_manifest(path: str) -> list:
+    base = os.path.dirname(os.path.abspath(path))
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            rows = json.load(f)
+    else:
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+    jobs = []
+    for row in rows:
+        file_path = row.get("file") or row.get("file_path")
+        jobs.append((os.path.join(base, file_path), int(row["prompt_id"])))
+    return jobs
+
+
+def pending_jobs(conn, jobs: list, force: bool = False):
+    """
+    İçerik hash'ini hesaplar, aynı (hash, prompt_id) ile daha önce
+    değerlendirilmiş dosyaları ayıklar. -> (bekleyenler, atlanan sayısı, hatalar)
+    """
+    pending, skipped, errors = [], 0, []
+    for path, prompt_id in jobs:
+        try:
+            sha = audio_sha256(path)
+        except OSError as e:
+            errors.append({"file": path, "prompt_id": prompt_id, "error": str(e)})
+            continue
+        if not force and conn.execute(
+                "SELECT 1 FROM recordings WHERE audio_sha256 = ? AND prompt_id = ? LIMIT 1",
+                (sha, prompt_id)).fetchone():
+            skipped += 1
+            continue
+        pending.append((path, prompt_id, sha))
+    return pending, skipped, errors
+
+
+# =========================
+# worker process
+# =========================
+_worker_model = None
+_worker_model_name = None
+_worker_profile = ((), None)
+
+
+def _init_worker(model_name: str, device: str | None, threads: int,
+                 profile_modes: tuple = (), profile_dir: str | None = None,
+                 dtype: str = "fp32") -> None:
+    """Her worker process'te bir kez: torch thread sayısını sınırla, modeli yükle."""
+    global _worker_model, _worker_model_name, _worker_profile
+    import torch
+    from model_registry import cache_name, get_model
+
+    torch.set_num_threads(threads)
+    _worker_model_name = cache_name(model_name, dtype)
+    _worker_model = get_model(model_name, device=device, dtype=dtype)
+    _worker_profile = (profile_modes, profile_dir)
+
+
+def _transcribe(path: str):
+    """-> (metin, worker'daki aşama süreleri ms). Profil açıksa dosya başına ayrı çıktı."""
+    from transcript_cache import cached_transcribe
+
+    timer = timings.StageTimer()
+    name = "batch_eval-" + os.path.splitext(os.path.basename(path))[0]
+    with profiling.profiled(name, *_worker_profile), timer.active():
+        result = cached_transcribe(_worker_model, _worker_model_name, path, language="en")
+    return result["text"], timer.as_ms()
+
+
+# =========================
+# runner
+# =========================
+def _write_rows(conn, rows: list) -> None:
+    """Satırları ve aşama sürelerini (timings tablosu) tek transaction'da yazar."""
+    if not rows:
+        return
+    sql = (f"INSERT INTO recordings ({', '.join(db.RECORDING_COLUMNS)}) "
+           f"VALUES ({', '.join('?' for _ in db.RECORDING_COLUMNS)})")
+    with conn:
+        t0 = time.monotonic()
+        ids = [conn.execute(sql, tuple(r.get(c) for c in db.RECORDING_COLUMNS)).lastrowid
+               for r in rows]
+        # toplu insert'in satır başına payı
+        per_row = round((time.monotonic() - t0) * 1000 / len(rows), 3)
+        conn.executemany(
+            "INSERT OR REPLACE INTO timings (recording_id, stage, ms) VALUES (?, ?, ?)",
+            [(row_id, stage, ms)
+             for row_id, r in zip(ids, rows)
+             for stage, ms in dict(r["timings_ms"], db_write=per_row).items()])
+    rows.clear()
+
+
+def run(jobs: list, db_path: str = DEFAULT_DB, model_name: str = DEFAULT_MODEL,
+        workers: int = DEFAULT_WORKERS, device: str | None = None,
+        force: bool = False, profile_modes: tuple = (), profile_dir: str | None = None,
+        dtype: str = "fp32") -> dict:
+    conn = db.get_connection(db_path)
+    prompts = dict(conn.execute("SELECT id, expected_text FROM prompts").fetchall())
+
+    t0 = time.monotonic()
+    pending, skipped, errors = pending_jobs(conn, jobs, force=force)
+    print(f"{len(jobs)} dosya: {len(pending)} değerlendirilecek, {skipped} zaten var",
+          file=sys.stderr)
+
+    missing = [(p, pid, sha) for p, pid, sha in pending if pid not in prompts]
+    for path, prompt_id, _ in missing:
+        errors.append({"file": path, "prompt_id": prompt_id, "error": "prompt_not_found"})
+    pending = [job for job in pending if job[1] in prompts]
+
+    done, rows = 0, []
+    if pending:
+        workers = max(1, min(workers, len(pending)))
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(model_name, device, threads,
+                                           profile_modes, profile_dir, dtype)) as pool:
+            futures = {pool.submit(_transcribe, path): (path, prompt_id, sha)
+                       for path, prompt_id, sha in pending}
+            try:
+                for future in as_completed(futures):
+                    path, prompt_id, sha = futures[future]
+                    try:
+                        user_text, stages = future.result()
+                    except Exception as e:
+                        errors.append({"file": path, "prompt_id": prompt_id, "error": repr(e)})
+                        print(f"[HATA] {path}: {e!r}", file=sys.stderr)
+                        continue
+                    t_cmp = time.monotonic()
+                    cmp = compare_texts(prompts[prompt_id], user_text)
+                    stages["compare"] = round((time.monotonic() - t_cmp) * 1000, 1)
+                    rows.append(dict(
+                        prompt_id=prompt_id, file_path=path, recognized_text=user_text,
+                        score=cmp["score"], ratio=cmp["ratio"], partial=cmp["partial"],
+                        token_sort=cmp["token_sort"], passed=cmp["passed"],
+                        feedback=cmp["feedback"], created_at=time.time(), audio_sha256=sha,
+                        timings_ms=stages))
+                    done += 1
+                    print(f"[OK] {os.path.basename(path)} -> prompt {prompt_id}, "
+                          f"score {cmp['score']}", file=sys.stderr)
+                    if len(rows) >= COMMIT_EVERY:
+                        _write_rows(conn, rows)
+            finally:
+                # Ctrl+C / hata olsa da bitenler yazılsın, sonraki çalışma atlasın
+                _write_rows(conn, rows)
+                for future in futures:
+                    future.cancel()
+
+    return {
+        "files": len(jobs),
+        "evaluated": done,
+        "skipped": skipped,
+        "failed": errors,
+        "seconds": round(time.monotonic() - t0, 2),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Batch STT evaluation into speech_eval_small.db")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--glob", help='audio files, e.g. "test/rec*.m4a"')
+    source.add_argument("--manifest", help="CSV (file,prompt_id) or JSON manifest")
+    parser.add_argument("--prompt-pattern", default=PROMPT_ID_PATTERN,
+                        help="regex on the file name whose first group is the prompt_id (--glob)")
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--dtype", default="fp32", choices=("fp32", "fp16", "int8"),
+                        help="int8: dynamically quantized Linear layers (CPU only)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="worker processes (each loads the model once)")
+    parser.add_argument("--force", action="store_true",
+                        help="re-evaluate files that already have a recording")
+    parser.add_argument("--profile", nargs="?", const="cprofile",
+                        default=os.environ.get(profiling.ENV_MODES),
+                        help="cprofile,tracemalloc,torch (or all); workers profile each file")
+    parser.add_argument("--profile-dir", default=None)
+    args = parser.parse_args(argv)
+    try:
+        profile_modes = profiling.parse_modes(args.profile)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.glob:
+        jobs = jobs_from_glob(args.glob, args.prompt_pattern)
+    else:
+        jobs = jobs_from_manifest(args.manifest)
+
+    with profiling.profiled("batch_eval", profile_modes, args.profile_dir):
+        summary = run(jobs, db_path=args.db, model_name=args.model, workers=args.workers,
+                      device=args.device, force=args.force, dtype=args.dtype,
+                      profile_modes=profile_modes, profile_dir=args.profile_dir)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,384 @@
+"""
+Backend hız ölçümleri.
+
+Backend'in yanındaki test/rec*.mp3 korpusu (ya da --corpus) üzerinde:
+  - model yükleme süresi (model boyutu başına)
+  - real-time factor: işlem süresi / ses süresi (model boyutu x thread sayısı)
+  - compare_texts çağrı/sn
+  - TTS render gecikmesi (cache'siz)
+  - recordings insert hızı (writer kuyruğu ve toplu executemany)
+  - int8 kuantize model (CPU): fp32'ye göre RTF, bellek ve doğruluk (WER)
+  - kısa pencere modu (short_clip): 30 sn pencereye göre RTF ve doğruluk (WER)
+
+Sonuç JSON'dur. Baseline dosyası verilirse her metrik onunla karşılaştırılır;
+TOLERANCE'tan fazla kötüleşen ya da ölçülmesi gerekirken sonuçta olmayan
+(bölümü hata veren) metrik varsa çıkış kodu 1 olur.
+"_per_s" ile biten metriklerde büyük, diğerlerinde küçük değer iyidir.
+
+    python benchmark.py --models tiny base --threads 1 4
+    python benchmark.py --save-baseline            # mevcut sonuçları baseline yap
+    python benchmark.py --only compare db          # sadece hızlı ölçümler
+    python benchmark.py --only quant --models base small
+    python benchmark.py --only short --models base
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_GLOB = os.path.join(BASE_DIR, "test", "rec*.mp3")
+BASELINE_PATH = os.path.join(BASE_DIR, "benchmark_baseline.json")
+TOLERANCE = 0.10                # %10'dan fazla kötüleşme = regresyon
+DEFAULT_MODELS = ("tiny", "base", "small", "large")
+DEFAULT_THREADS = tuple(sorted({1, os.cpu_count() or 1}))
+DB_PATH = os.path.join(BASE_DIR, "speech_eval_small.db")   # quant: beklenen metinler
+SECTIONS = ("stt", "compare", "tts", "db", "quant", "short")
+INFO_KEYS = {"corpus_audio_s"}   # ölçüm değil, karşılaştırılmaz
+
+# compare_texts için sabit girişler (prompt, tanınan metin)
+COMPARE_PAIRS = [
+    ("Climb and maintain flight level 350.", "climb and maintain flight level three fifty"),
+    ("Cleared for takeoff runway 27 left.", "cleared for take off runway two seven left"),
+    ("Report established on the localizer.", "report established localizer"),
+    ("Tower, November 1 2 3 Alfa Bravo ready for departure runway 18.",
+     "tower november one two three alpha bravo ready for departure runway one eight"),
+]
+
+
+# =========================
+# measurements
+# =========================
+def bench_stt(paths: list, models, threads) -> dict:
+    import torch
+    import feature_cache
+    import model_registry
+
+    # ffmpeg süresi ölçüme karışmasın: sesler önceden çözülür
+    audios = [feature_cache.load_pcm(p, writable=True) for p in paths]
+    audio_seconds = sum(len(a) for a in audios) / 16000
+
+    out = {}
+    for name in models:
+        t0 = time.perf_counter()
+        model = model_registry.load_model(name)
+        out[f"model_load_s.{name}"] = round(time.perf_counter() - t0, 3)
+
+        # ilk çağrıdaki tek seferlik kurulum RTF'ye girmesin
+        model.transcribe(audios[0], language="en", temperature=0.0)
+        for n in threads:
+            torch.set_num_threads(n)
+            t0 = time.perf_counter()
+            for audio in audios:
+                model.transcribe(audio, language="en", temperature=0.0,
+                                 condition_on_previous_text=False)
+            elapsed = time.perf_counter() - t0
+            out[f"rtf.{name}.t{n}"] = round(elapsed / audio_seconds, 4)
+        del model
+    out["corpus_audio_s"] = round(audio_seconds, 2)
+    return out
+
+
+def _words(text: str) -> list:
+    return re.sub(r"[^\w\s]", " ", text.lower()).split()
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """Kelime düzeyinde (ekleme + silme + değiştirme) / referans kelime sayısı."""
+    ref, hyp = _words(reference), _words(hypothesis)
+    row = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        prev, row[0] = row[0], i
+        for j, h in enumerate(hyp, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (r != h))
+    return row[-1] / max(len(ref), 1)
+
+
+def _expected_texts(paths: list, db_path: str = DB_PATH) -> dict:
+    """recN.mp3 -> N numaralı prompt'un metni (DB yoksa boş)."""
+    from batch_eval import PROMPT_ID_PATTERN
+
+    if not os.path.exists(db_path):
+        return {}
+    conn = sqlite3.connect(db_path)
+    try:
+        prompts = dict(conn.execute("SELECT id, expected_text FROM prompts").fetchall())
+    finally:
+        conn.close()
+    out = {}
+    for path in paths:
+        m = re.search(PROMPT_ID_PATTERN, os.path.splitext(os.path.basename(path))[0])
+        if m and int(m.group(1)) in prompts:
+            out[path] = prompts[int(m.group(1))]
+    return out
+
+
+def bench_quant(paths: list, models) -> dict:
+    """
+    Her model için fp32 ve int8 (dinamik kuantize Linear) CPU'da:
+    RTF, model belleği, beklenen metne göre WER ve int8'in fp32'den sapması.
+    """
+    import feature_cache
+    import model_registry
+
+    audios = [feature_cache.load_pcm(p, writable=True) for p in paths]
+    audio_seconds = sum(len(a) for a in audios) / 16000
+    expected = _expected_texts(paths)
+
+    out = {}
+    for name in models:
+        texts = {}
+        for dtype in ("fp32", "int8"):
+            model = model_registry.load_model(name, "cpu", dtype)
+            out[f"quant.model_mb.{name}.{dtype}"] = round(model_registry.model_bytes(model) / 1e6, 1)
+            model.transcribe(audios[0], language="en", temperature=0.0, fp16=False)
+            t0 = time.perf_counter()
+            texts[dtype] = [model.transcribe(a, language="en", temperature=0.0, fp16=False,
+                                             condition_on_previous_text=False)["text"]
+                            for a in audios]
+            out[f"quant.rtf.{name}.{dtype}"] = round((time.perf_counter() - t0) / audio_seconds, 4)
+            scored = [(expected[p], t) for p, t in zip(paths, texts[dtype]) if p in expected]
+            if scored:
+                out[f"quant.wer.{name}.{dtype}"] = round(
+                    sum(word_error_rate(ref, hyp) for ref, hyp in scored) / len(scored), 4)
+            del model
+        out[f"quant.wer_int8_vs_fp32.{name}"] = round(
+            sum(word_error_rate(ref, hyp) for ref, hyp in zip(texts["fp32"], texts["int8"]))
+            / max(len(audios), 1), 4)
+    return out
+
+
+def bench_short(paths: list, models) -> dict:
+    """
+    short_clip: aynı greedy decode, 30 sn pencere ("full") ve kovalı kısa
+    pencere ("short"). RTF, beklenen metne göre WER ve kısa pencerenin
+    30 sn'ye göre sapması.
+    """
+    import feature_cache
+    import model_registry
+    import short_clip
+
+    audios = [feature_cache.load_pcm(p, writable=True) for p in paths]
+    audio_seconds = sum(len(a) for a in audios) / 16000
+    expected = _expected_texts(paths)
+
+    out = {}
+    for name in models:
+        model = model_registry.load_model(name)
+        texts = {}
+        for mode, buckets in (("full", (30,)), ("short", short_clip.BUCKET_SECONDS)):
+            wrapped = short_clip.ShortClipModel(model, buckets)
+            wrapped.transcribe(audios[0], language="en")
+            t0 = time.perf_counter()
+            texts[mode] = [wrapped.transcribe(a, language="en")["text"] for a in audios]
+            out[f"short.rtf.{name}.{mode}"] = round((time.perf_counter() - t0) / audio_seconds, 4)
+            scored = [(expected[p], t) for p, t in zip(paths, texts[mode]) if p in expected]
+            if scored:
+                out[f"short.wer.{name}.{mode}"] = round(
+                    sum(word_error_rate(ref, hyp) for ref, hyp in scored) / len(scored), 4)
+        out[f"short.wer_short_vs_full.{name}"] = round(
+            sum(word_error_rate(ref, hyp) for ref, hyp in zip(texts["full"], texts["short"]))
+            / max(len(audios), 1), 4)
+        del model
+    return out
+
+
+def bench_compare(seconds: float = 1.0) -> dict:
+    from compare import compare_texts
+
+    n = 0
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        for target, user in COMPARE_PAIRS:
+            compare_texts(target, user)
+        n += len(COMPARE_PAIRS)
+    return {"compare_texts_per_s": round(n / (time.perf_counter() - t0), 1)}
+
+
+def bench_tts(text: str = COMPARE_PAIRS[0][0], voice=None, rate: int = 180) -> dict:
+    import tts_cache
+
+    old_dir = tts_cache.CACHE_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        tts_cache.CACHE_DIR = tmp
+        try:
+            t0 = time.perf_counter()
+            tts_cache.render(text, voice, rate)
+            render_s = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            tts_cache.render(text, voice, rate)
+            cached_s = time.perf_counter() - t0
+        finally:
+            tts_cache.CACHE_DIR = old_dir
+    return {"tts_render_ms": round(render_s * 1000, 1),
+            "tts_cached_lookup_ms": round(cached_s * 1000, 3)}
+
+
+def bench_db(rows: int = 5000) -> dict:
+    import db
+
+    # writer thread'inin bağlantısı açık kalır (Windows'ta silinemeyebilir)
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+        path = os.path.join(tmp, "bench.db")
+        conn = db.open_database(path)
+        row = dict(prompt_id=1, file_path="bench.wav", recognized_text="bench",
+                   score=90, ratio=90, partial=90, token_sort=90, passed=True,
+                   feedback="", user_id="bench")
+
+        t0 = time.perf_counter()
+        for _ in range(rows):
+            db.insert_recording(path, row)
+        db.get_writer(path).flush()
+        queued = rows / (time.perf_counter() - t0)
+
+        sql = (f"INSERT INTO recordings ({', '.join(db.RECORDING_COLUMNS)}) "
+               f"VALUES ({', '.join('?' for _ in db.RECORDING_COLUMNS)})")
+        params = [tuple(row.get(c) for c in db.RECORDING_COLUMNS)] * rows
+        t0 = time.perf_counter()
+        with conn:
+            conn.executemany(sql, params)
+        bulk = rows / (time.perf_counter() - t0)
+        conn.close()
+    return {"insert_queued_per_s": round(queued, 1), "insert_bulk_per_s": round(bulk, 1)}
+
+
+# =========================
+# baseline comparison
+# =========================
+SECTION_PREFIXES = {
+    "stt": ("model_load_s.", "rtf."),
+    "compare": ("compare_texts_",),
+    "tts": ("tts_",),
+    "db": ("insert_",),
+    "quant": ("quant.",),
+    "short": ("short.",),
+}
+
+
+def _was_measured(key: str, sections=None, models=None, threads=None) -> bool:
+    """Bu çalıştırmada (sections / models / threads ile) üretilmesi gereken metrik mi?"""
+    if sections is not None and not any(key.startswith(p) for s in sections
+                                        for p in SECTION_PREFIXES.get(s, ())):
+        return False
+    parts = key.split(".")
+    if models is not None and any(p in DEFAULT_MODELS and p not in models for p in parts):
+        return False
+    if threads is not None and any(re.fullmatch(r"t\d+", p) and int(p[1:]) not in threads
+                                   for p in parts):
+        return False
+    return True
+
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float = TOLERANCE,
+                        sections=None, models=None, threads=None) -> list:
+    """
+    Baseline'a göre tolerance'tan fazla kötüleşen metrikler. Bu çalıştırmada
+    ölçülmesi gerekip sonuçta olmayan metrik (ör. bölüm hata verdi) de
+    regresyondur ("missing": true).
+    """
+    regressions = []
+    for key, base in baseline.items():
+        value = results.get(key)
+        if key in INFO_KEYS or not isinstance(base, (int, float)):
+            continue
+        if not isinstance(value, (int, float)):
+            if _was_measured(key, sections, models, threads):
+                regressions.append({"metric": key, "baseline": base, "value": value,
+                                    "change_pct": None, "missing": True})
+            continue
+        if base == 0:
+            continue
+        higher_is_better = key.endswith("_per_s")
+        change = (value - base) / base
+        worse = -change if higher_is_better else change
+        if worse > tolerance:
+            regressions.append({"metric": key, "baseline": base, "value": value,
+                                "change_pct": round(change * 100, 1)})
+    return regressions
+
+
+def run(sections=SECTIONS, models=DEFAULT_MODELS, threads=DEFAULT_THREADS,
+        corpus_glob: str = CORPUS_GLOB) -> dict:
+    results, errors = {}, {}
+
+    def corpus() -> list:
+        paths = sorted(glob.glob(corpus_glob))
+        if not paths:
+            raise FileNotFoundError(f"no audio files match {corpus_glob}")
+        return paths
+
+    steps = {
+        "stt": lambda: bench_stt(corpus(), models, threads),
+        "compare": bench_compare,
+        "tts": bench_tts,
+        "db": bench_db,
+        "quant": lambda: bench_quant(corpus(), models),
+        "short": lambda: bench_short(corpus(), models),
+    }
+    for section in sections:
+        try:
+            results.update(steps[section]())
+        except Exception as e:
+            # ör. TTS motoru / model ağırlıkları olmayan makine: diğer ölçümler sürsün
+            errors[section] = repr(e)
+    return {"results": results, "errors": errors}
+
+
+def environment() -> dict:
+    env = {"python": platform.python_version(), "platform": platform.platform(),
+           "cpu_count": os.cpu_count()}
+    try:
+        import torch
+        env["torch"] = torch.__version__
+        env["cuda"] = torch.cuda.is_available()
+    except ImportError:
+        pass
+    return env
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="ClearComs backend benchmarks")
+    parser.add_argument("--only", nargs="+", choices=SECTIONS, default=list(SECTIONS))
+    parser.add_argument("--models", nargs="+", default=list(DEFAULT_MODELS))
+    parser.add_argument("--threads", nargs="+", type=int, default=list(DEFAULT_THREADS))
+    parser.add_argument("--corpus", default=CORPUS_GLOB, help="glob of audio files for STT")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="write these results as the new baseline")
+    parser.add_argument("--out", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    report = {"environment": environment()}
+    report.update(run(args.only, args.models, args.threads, args.corpus))
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+    report["regressions"] = (compare_to_baseline(report["results"], baseline, args.tolerance,
+                                                 args.only, args.models, args.threads)
+                             if baseline else [])
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"environment": report["environment"], "results": report["results"]},
+                      f, ensure_ascii=False, indent=2)
+            f.write("\n")
+    return 1 if report["regressions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
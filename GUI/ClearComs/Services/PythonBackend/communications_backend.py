@@ -5,12 +5,12 @@ import tempfile
 import subprocess
 import shutil
 import json
+import threading
+import time
 
-import whisper
-from fuzzywuzzy import fuzz
-import sounddevice as sd
-from scipy.io.wavfile import write as wav_write
-import pyttsx3
+# Ağır bağımlılıklar (whisper/torch, sounddevice, scipy, pyttsx3, numpy) onları
+# kullanan fonksiyonların içinde import edilir; böylece ör. "play_prompt 1"
+# torch'un import süresini ödemez. Bkz. "import-time" komutu.
 
 
 # =========================
@@ -19,15 +19,34 @@ import pyttsx3
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "speech_eval_small.db")
 WHISPER_MODEL_NAME = "base"
+WHISPER_DEVICE = None       # None -> cuda if available, else cpu
+WHISPER_DTYPE = "fp32"      # "fp16" (GPU) or "int8" (CPU, quantized Linear layers)
 RECORD_SECONDS = 5          # defoult recordig time
-SAMPLE_RATE = 44100
+SAMPLE_RATE = 44100         # fallback capture rate if the mic can't do 16 kHz
 PASS_THRESHOLD = 80         # compare_texts passing treshold
+USE_VAD = True              # stop recording on trailing silence instead of fixed duration (limits: audio_capture.py)
+SAVE_RECORDINGS = True      # keep a .wav copy of each take (written in the background)
+USE_TRANSCRIPT_CACHE = True # reuse transcripts of identical audio (see transcript_cache.py)
+STT_CASCADE = None          # e.g. ("base", "small"): fast model first, next one only when unsure
+CASCADE_MIN_LOGPROB = -0.6  # avg_logprob below this = model unsure of its own text
+CASCADE_SILENCE_PROB = 0.8  # no_speech_prob above this = confidently no speech
+CASCADE_SCORE_MARGIN = 15   # |score - PASS_THRESHOLD| below this = borderline attempt
+EVAL_MODE = "transcribe"    # "verify": score the prompt text in one decoder pass (prompt_scoring.py)
+EVAL_MODES = ("transcribe", "verify")
+EARLY_EXIT = False          # stop decoding once the attempt is clearly passed/failed (early_exit.py)
+SHORT_CLIP_MODE = False     # encode short takes in 5/10/15/20 s windows instead of 30 s (short_clip.py)
+RECOGNIZE_TOP_K = 5         # drill mode: how many candidate prompts to return
+TTS_RATE = 180
+TTS_VOICE = "com.apple.speech.synthesis.voice.Alex" if sys.platform == "darwin" else None
+USE_TTS_CACHE = True        # play pre-rendered prompt audio (see tts_cache.py)
 
 
 # =========================
 # Compare function
 # =========================
 def compare_texts(target: str, user: str):
+    from fuzzywuzzy import fuzz
+
     target_norm = target.lower().strip()
     user_norm   = user.lower().strip()
 
@@ -51,43 +70,139 @@ def compare_texts(target: str, user: str):
 # =========================
 # DB helper
 # =========================
+def get_db_connection() -> sqlite3.Connection:
+    """Bu thread'in açık tuttuğu DB bağlantısı (WAL, bkz. db.py)."""
+    import db
+    return db.get_connection(DB_PATH)
+
+
 def get_prompt_by_id(prompt_id: int) -> str | None:
     """prompts tablosundan expected_text döndürür."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    c = get_db_connection().cursor()
     c.execute("SELECT expected_text FROM prompts WHERE id = ?", (prompt_id,))
     row = c.fetchone()
-    conn.close()
     return row[0] if row else None
 
 
+def get_all_prompts() -> dict:
+    """{prompt_id: expected_text}, kapalı küme tanıma (drill modu) için."""
+    c = get_db_connection().cursor()
+    c.execute("SELECT id, expected_text FROM prompts ORDER BY id")
+    return dict(c.fetchall())
+
+
 def save_recording(prompt_id: int,
                    file_path: str,
                    recognized_text: str,
-                   cmp: dict) -> None:
-    """recordings tablosuna sonuç yazar."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        """
-        INSERT INTO recordings
-        (prompt_id, file_path, recognized_text, score, ratio, partial, token_sort, passed, feedback)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   cmp: dict,
+                   user_id: str | None = None,
+                   audio_sha256: str | None = None,
+                   timings: dict | None = None,
+                   mode: str = "transcribe"):
+    """
+    recordings tablosuna sonuç yazar. Insert tek yazar thread'inin kuyruğuna
+    gider (write-behind); dönen Future yeni satırın id'si ile tamamlanır.
+    timings ({aşama: ms}) verilirse aynı id ile timings tablosuna yazılır.
+    mode satırı üreten değerlendirme modudur; istatistik tabloları sadece
+    "transcribe" satırlarını sayar (verify skoru compare skoruyla kıyaslanamaz).
+    """
+    import db
+    return db.insert_recording(DB_PATH, {
+        "prompt_id": prompt_id,
+        "file_path": file_path,
+        "recognized_text": recognized_text,
+        "score": cmp.get("score"),
+        "ratio": cmp.get("ratio"),
+        "partial": cmp.get("partial"),
+        "token_sort": cmp.get("token_sort"),
+        "passed": cmp.get("passed"),
+        "feedback": cmp.get("feedback"),
+        "user_id": user_id,
+        "audio_sha256": audio_sha256,
+        "mode": mode,
+    }, timings=timings)
+
+
+def save_timings(future, stages: dict) -> None:
+    """save_recording'in satırı commit edilince stages'i ({aşama: ms}) timings tablosuna yazar."""
+    import db
+    db.attach_timings(DB_PATH, future, stages)
+
+
+def wait_saved(future) -> dict:
+    """
+    save_recording'in Future'ını bekler -> {"recording_id": id} ya da
+    yazılamadıysa {"recording_id": None, "error": "db_write_failed", "message": ...}.
+    """
+    import db
+    recording_id, error = db.wait_for_write(future)
+    if error is not None:
+        return {"recording_id": None, "error": "db_write_failed", "message": error}
+    return {"recording_id": recording_id}
+
+
+# =========================
+# Progress statistics
+# =========================
+# prompt_stats / user_stats tabloları recordings insert'lerinde trigger ile
+# güncellenir (bkz. create_db.py v3, v5); buradaki sorgular geçmiş ne kadar
+# büyük olursa olsun tek satır / küçük tablo okur. Sadece "transcribe"
+# modundaki (compare_texts skorlu) denemeler sayılır.
+# Not: insert'ler write-behind olduğu için son kayıt birkaç ms sonra görünür.
+STATS_COLUMNS = "attempts, passes, score_sum, score_sq_sum, last_attempt_at, last_recording_id"
+
+
+def _stats_dict(row) -> dict:
+    attempts, passes, score_sum, score_sq_sum, last_at, last_id = row
+    mean = score_sum / attempts if attempts else 0.0
+    variance = max(score_sq_sum / attempts - mean * mean, 0.0) if attempts else 0.0
+    return {
+        "attempts": attempts,
+        "passes": passes,
+        "pass_rate": round(passes / attempts, 4) if attempts else 0.0,
+        "avg_score": round(mean, 2),
+        "score_stddev": round(variance ** 0.5, 2),
+        "last_attempt_at": last_at,
+        "last_recording_id": last_id,
+    }
+
+
+def get_prompt_stats(prompt_id: int | None = None):
+    """Tek prompt için istatistik dict'i; prompt_id yoksa tüm prompt'ların listesi."""
+    conn = get_db_connection()
+    if prompt_id is None:
+        rows = conn.execute(
+            f"SELECT prompt_id, {STATS_COLUMNS} FROM prompt_stats ORDER BY prompt_id").fetchall()
+        return [dict(_stats_dict(r[1:]), prompt_id=r[0]) for r in rows]
+    row = conn.execute(
+        f"SELECT {STATS_COLUMNS} FROM prompt_stats WHERE prompt_id = ?", (prompt_id,)).fetchone()
+    return dict(_stats_dict(row or (0, 0, 0, 0, None, None)), prompt_id=prompt_id)
+
+
+def get_user_stats(user_id: str) -> dict:
+    """Bir kullanıcının toplam denemesi, başarı oranı, ortalama skoru."""
+    row = get_db_connection().execute(
+        f"SELECT {STATS_COLUMNS} FROM user_stats WHERE user_id = ?", (user_id,)).fetchone()
+    return dict(_stats_dict(row or (0, 0, 0, 0, None, None)), user_id=user_id)
+
+
+def get_leaderboard(limit: int = 10, min_attempts: int = 1) -> list:
+    """Ortalama skora göre en iyi kullanıcılar."""
+    rows = get_db_connection().execute(
+        f"""
+        SELECT user_id, {STATS_COLUMNS} FROM user_stats
+        WHERE attempts >= ? ORDER BY score_sum / attempts DESC LIMIT ?
         """,
-        (
-            prompt_id,
-            file_path,
-            recognized_text,
-            cmp.get("score"),
-            cmp.get("ratio"),
-            cmp.get("partial"),
-            cmp.get("token_sort"),
-            cmp.get("passed"),
-            cmp.get("feedback"),
-        ),
-    )
-    conn.commit()
-    conn.close()
+        (min_attempts, limit),
+    ).fetchall()
+    return [dict(_stats_dict(r[1:]), user_id=r[0]) for r in rows]
+
+
+def timing_report(since_hours: float | None = None) -> dict:
+    """Aşama başına p50/p95/p99 süreler (ms), bkz. timings.py."""
+    import timings
+    since = time.time() - since_hours * 3600 if since_hours else None
+    return {"stages": timings.report(get_db_connection(), since=since)}
 
 
 # =========================
@@ -95,32 +210,56 @@ def save_recording(prompt_id: int,
 # =========================
 def _init_tts_engine():
     """pyttsx3 engine init (macOS için nsss driver tercih eder)."""
+    import pyttsx3
+
     try:
         if sys.platform == "darwin":
             engine = pyttsx3.init(driverName="nsss")
             # defoult alex speech sound:
             try:
-                engine.setProperty("voice", "com.apple.speech.synthesis.voice.Alex")
+                engine.setProperty("voice", TTS_VOICE)
             except Exception:
                 pass
         else:
             engine = pyttsx3.init()
-        engine.setProperty("rate", 180)
+        engine.setProperty("rate", TTS_RATE)
         return engine
     except Exception as e:
         raise RuntimeError(f"TTS init failed: {e}")
 
 
+_tts_engine_cache = None
+
+
+def get_tts_engine():
+    """TTS engine'i cache'leyerek döndürür."""
+    global _tts_engine_cache
+    if _tts_engine_cache is None:
+        _tts_engine_cache = _init_tts_engine()
+    return _tts_engine_cache
+
+
 def speak_text(text: str) -> None:
-    """Verilen metni sesli okur (pyttsx3, gerekirse sistem fallback)."""
-    # first try pyttsx3
+    """Verilen metni sesli okur (önce TTS cache, sonra pyttsx3, gerekirse sistem fallback)."""
+    global _tts_engine_cache
+    # pre-rendered audio: no engine startup, no synthesis
+    if USE_TTS_CACHE:
+        try:
+            import tts_cache
+            tts_cache.speak_cached(text, TTS_VOICE, TTS_RATE)
+            return
+        except Exception:
+            pass
+
+    # then pyttsx3
     try:
-        engine = _init_tts_engine()
+        engine = get_tts_engine()
         engine.say(text)
         engine.runAndWait()
         return
     except Exception:
-        pass
+        # broken engine should not be reused on the next call
+        _tts_engine_cache = None
 
     #if pyttsx3 fails
     try:
@@ -160,71 +299,294 @@ def play_prompt(prompt_id: int) -> dict:
     }
 
 
+def render_prompts() -> dict:
+    """prompts tablosundaki tüm cümleleri TTS cache'e önceden üretir."""
+    import tts_cache
+
+    return tts_cache.render_all(TTS_VOICE, TTS_RATE, db_path=DB_PATH)
+
+
 # =========================
 # recording + Whisper STT
 # =========================
-def record_audio(duration: int = RECORD_SECONDS,
-                 samplerate: int = SAMPLE_RATE) -> str:
-    """Mikrofondan ses kaydeder, geçici .wav dosyasının yolunu döndürür."""
+def capture_audio(duration: int = RECORD_SECONDS,
+                  samplerate: int = SAMPLE_RATE,
+                  vad: bool = False):
+    """
+    Mikrofondan int16 mono kayıt alır, (n, 1) dizi döndürür.
+    vad=True ise sabit süre yerine konuşma bitince (sessizlikte) durur;
+    o durumda duration yerine audio_capture.MAX_RECORD_SECONDS üst sınırdır.
+    """
+    import sounddevice as sd
+    import audio_capture
+
+    if vad:
+        return audio_capture.record_until_silence(samplerate=samplerate)
     data = sd.rec(int(duration * samplerate),
                   samplerate=samplerate,
                   channels=1,
                   dtype="int16")
     sd.wait()
+    return data
 
+
+def record_audio(duration: int = RECORD_SECONDS,
+                 samplerate: int = SAMPLE_RATE,
+                 vad: bool = False) -> str:
+    """Mikrofondan ses kaydeder, geçici .wav dosyasının yolunu döndürür."""
+    from scipy.io.wavfile import write as wav_write
+
+    data = capture_audio(duration=duration, samplerate=samplerate, vad=vad)
     tmp = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
     wav_write(tmp.name, samplerate, data)
     return tmp.name
 
 
-_whisper_model_cache = None
+def record_for_whisper(duration: int = RECORD_SECONDS, vad: bool = False):
+    """
+    Kaydı doğrudan Whisper'ın istediği 16 kHz float32 diziye çevirir.
+    SAVE_RECORDINGS açıksa .wav kopyası arka planda yazılır.
+    -> (audio, audio_path | None)
+    """
+    import audio_capture
+
+    samplerate = audio_capture.capture_rate(fallback=SAMPLE_RATE)
+    data = capture_audio(duration=duration, samplerate=samplerate, vad=vad)
+    audio = audio_capture.to_whisper_audio(data, samplerate)
 
+    audio_path = None
+    if SAVE_RECORDINGS:
+        tmp = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
+        tmp.close()
+        audio_path = tmp.name
+        audio_capture.save_wav_async(audio_path, samplerate, data)
+    return audio, audio_path
 
-def load_whisper_model():
-    """Whisper modelini cache’leyerek yükler."""
-    global _whisper_model_cache
-    if _whisper_model_cache is None:
-        _whisper_model_cache = whisper.load_model(WHISPER_MODEL_NAME)
-    return _whisper_model_cache
 
+def record_streaming(expected: str | None, on_partial):
+    """
+    VAD ile kayıt alırken aynı anda Whisper'a besler; on_partial her kısmi
+    metinde çağrılır. -> (user_text, audio_path | None)
+    """
+    import audio_capture
+    import streaming_stt
 
-def speech_to_text(audio_path: str) -> str:
-    """Whisper ile ses dosyasını çözümler ve metni döndürür."""
-    model = load_whisper_model()
-    result = model.transcribe(audio_path, language="en")
-    return result["text"]
+    samplerate = audio_capture.capture_rate(fallback=SAMPLE_RATE)
+    stt = streaming_stt.StreamingTranscriber(load_whisper_model(),
+                                             expected=expected,
+                                             compare=compare_texts,
+                                             on_partial=on_partial)
 
+    def on_block(block, speaking):
+        stt.feed(audio_capture.to_whisper_audio(block, samplerate), speaking)
 
-# =========================
-# main evaluation function
-# =========================
-def record_and_evaluate(prompt_id: int,
-                        duration: int = RECORD_SECONDS) -> dict:
+    try:
+        data = audio_capture.record_until_silence(samplerate=samplerate, on_block=on_block)
+    finally:
+        user_text = stt.finish()
+
+    audio_path = None
+    if SAVE_RECORDINGS:
+        tmp = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
+        tmp.close()
+        audio_path = tmp.name
+        audio_capture.save_wav_async(audio_path, samplerate, data)
+    return user_text, audio_path
+
+
+def load_whisper_model(replica: int = 0, name: str | None = None):
+    """Whisper modelini ortak model_registry üzerinden (bir kez) yükler."""
+    import model_registry
+    return model_registry.get_model(name or WHISPER_MODEL_NAME, device=WHISPER_DEVICE,
+                                    dtype=WHISPER_DTYPE, replica=replica)
+
+
+def _transcribe_with(model, model_name: str, audio) -> dict:
     """
-    1) prompt metnini DB’den çeker
-    2) mikrofondan ses kaydı alır
-    3) Whisper ile çözümler
-    4) compare_texts ile kıyaslar
-    5) recordings tablosuna yazar
-    6) sonucu dict olarak döndürür
+    Tek bir modelle tam Whisper sonucu (segmentlerle). model: Whisper modeli
+    ya da onu döndüren fonksiyon; cache hit olursa model hiç yüklenmez.
     """
-    expected = get_prompt_by_id(prompt_id)
-    if not expected:
-        return {"error": "prompt_not_found", "prompt_id": prompt_id}
+    import timings
 
-    # recording
-    audio_path = record_audio(duration=duration)
+    if SHORT_CLIP_MODE:
+        import short_clip
+        model, model_name = short_clip.wrap(model), model_name + ".short"
+    if USE_TRANSCRIPT_CACHE:
+        import model_registry
+        import transcript_cache
+        return transcript_cache.cached_transcribe(
+            model, model_registry.cache_name(model_name, WHISPER_DTYPE), audio, language="en")
+    if not hasattr(model, "transcribe"):
+        with timings.stage("model_load"):
+            model = model()
+    if isinstance(audio, str):
+        import feature_cache
+        with timings.stage("audio_decode"):
+            audio = feature_cache.load_pcm(audio, writable=True)
+    return timings.transcribe(model, audio, language="en")
 
-    # STT
-    user_text = speech_to_text(audio_path)
 
-    # compare
-    cmp = compare_texts(expected, user_text)
+def transcript_confidence(result: dict):
+    """
+    Whisper segmentlerinden (avg_logprob, no_speech_prob).
+    avg_logprob token sayısıyla ağırlıklı ortalama; no_speech_prob en düşük
+    segmentinki (kaydın tamamı sessiz görünüyorsa yüksektir). Segment yoksa (None, None).
+    """
+    segments = result.get("segments") or []
+    if not segments:
+        return None, None
+    weights = [max(len(seg.get("tokens") or ()), 1) for seg in segments]
+    logprob = sum(seg["avg_logprob"] * w for seg, w in zip(segments, weights)) / sum(weights)
+    no_speech = min(seg["no_speech_prob"] for seg in segments)
+    return logprob, no_speech
 
-    # save to DB
-    save_recording(prompt_id, audio_path, user_text, cmp)
 
-    # output for C# or CLI
+def cascade_decision(result: dict, expected: str | None = None) -> tuple:
+    """
+    Hızlı modelin sonucu kabul edilebilir mi? -> (kabul, sebep)
+    Net durumlar: model emin ve skor eşiğin açıkça üstünde/altında,
+    ya da kayıt net olarak sessiz. Geri kalan her şey sınırda sayılır.
+    """
+    logprob, no_speech = transcript_confidence(result)
+    text = result.get("text", "").strip()
+    if no_speech is not None and no_speech >= CASCADE_SILENCE_PROB and len(text) < 3:
+        return True, "silence"
+    if logprob is None or logprob < CASCADE_MIN_LOGPROB:
+        return False, "low_logprob"
+    if expected:
+        score = compare_texts(expected, text)["score"]
+        if abs(score - PASS_THRESHOLD) < CASCADE_SCORE_MARGIN:
+            return False, "borderline_score"
+        return True, "clear_pass" if score >= PASS_THRESHOLD else "clear_fail"
+    return True, "confident"
+
+
+def _early_exit_transcribe(audio, expected: str, model=None) -> dict | None:
+    """EARLY_EXIT decode'u; 30 sn'den uzun kayıtlarda None (normal yol)."""
+    import early_exit
+    import timings
+    from whisper.audio import N_SAMPLES
+
+    if isinstance(audio, str):
+        import feature_cache
+        with timings.stage("audio_decode"):
+            audio = feature_cache.load_pcm(audio, writable=True)
+    if len(audio) > N_SAMPLES:
+        return None
+    if model is None:
+        with timings.stage("model_load"):
+            model = load_whisper_model()
+    with timings.stage("whisper_early_exit"):
+        return early_exit.decode(model, audio, expected, pass_threshold=PASS_THRESHOLD,
+                                 score=lambda target, user: compare_texts(target, user)["score"])
+
+
+def transcribe_detailed(audio, model=None, expected: str | None = None) -> dict:
+    """
+    speech_to_text'in ayrıntılı hali:
+    {"text", "model", "cascade": [{"model", "accepted", "reason", ...}, ...]}
+    STT_CASCADE ayarlıysa (ve model verilmediyse) modeller sırayla denenir,
+    ilk net sonuç kabul edilir; son model her zaman kabul edilir.
+    EARLY_EXIT ayarlıysa ve expected verildiyse decode sonuç belli olunca
+    durur; "early_exit" ("pass" / "fail") doluysa metin kısmi transkripttir.
+    Bu yol cascade'i ve transcript cache'i kullanmaz (sonuç hedefe bağlı).
+    """
+    if EARLY_EXIT and expected:
+        result = _early_exit_transcribe(audio, expected, model)
+        if result is not None:
+            return {"text": result["text"], "model": WHISPER_MODEL_NAME, "cascade": [],
+                    "early_exit": result["early_exit"]}
+
+    if model is not None or not STT_CASCADE:
+        name = WHISPER_MODEL_NAME
+        result = _transcribe_with(model or (lambda: load_whisper_model()), name, audio)
+        return {"text": result["text"], "model": name, "cascade": []}
+
+    steps = []
+    for i, name in enumerate(STT_CASCADE):
+        result = _transcribe_with(lambda name=name: load_whisper_model(name=name), name, audio)
+        logprob, no_speech = transcript_confidence(result)
+        last = i == len(STT_CASCADE) - 1
+        accepted, reason = (True, "last_model") if last else cascade_decision(result, expected)
+        steps.append({"model": name, "accepted": accepted, "reason": reason,
+                      "avg_logprob": None if logprob is None else round(logprob, 3),
+                      "no_speech_prob": None if no_speech is None else round(no_speech, 3)})
+        if accepted:
+            return {"text": result["text"], "model": name, "cascade": steps}
+
+
+def verify_speech(audio, expected: str, model=None) -> dict:
+    """
+    "verify" modu: serbest decode yok, beklenen metin teacher-forced puanlanır.
+    -> prompt_scoring.verify sonucu (score, passed, words, missed, token_logprobs...)
+    """
+    import prompt_scoring
+    import timings
+
+    if model is None:
+        with timings.stage("model_load"):
+            model = load_whisper_model()
+    return prompt_scoring.verify(model, audio, expected, pass_threshold=PASS_THRESHOLD)
+
+
+def verify_to_cmp(verified: dict) -> dict:
+    """verify sonucunu compare_texts biçimine çevirir (recordings / build_result için)."""
+    passed = verified["passed"]
+    feedback = "Good work, keep up!" if passed else "You have to practice more"
+    if verified["missed"]:
+        feedback += " (missed: " + ", ".join(verified["missed"]) + ")"
+    return {
+        "score": verified["score"],
+        "ratio": None,
+        "partial": None,
+        "token_sort": None,
+        "passed": 1 if passed else 0,
+        "feedback": feedback,
+    }
+
+
+def _evaluate_stt(audio, expected: str, mode: str, model=None):
+    """
+    Modun STT + karşılaştırma adımı -> (tanınan metin, cmp, sonuca eklenecekler).
+    verify modunda serbest transkript yoktur: tanınan metin None, hedefin
+    söylendiği kabul edilen kelimeleri "matched_text" olarak döner.
+    """
+    import timings
+
+    if mode == "verify":
+        verified = verify_speech(audio, expected, model=model)
+        extra = {key: verified[key] for key in ("avg_logprob", "no_speech_prob", "words")}
+        extra["matched_text"] = " ".join(w["word"] for w in verified["words"] if w["matched"])
+        return None, verify_to_cmp(verified), dict(extra, mode="verify")
+
+    stt = transcribe_detailed(audio, model=model, expected=expected)
+    with timings.stage("compare"):
+        cmp = compare_texts(expected, stt["text"])
+    extra = {"stt_model": stt["model"], "cascade": stt["cascade"]} if stt["cascade"] else {}
+    if "early_exit" in stt:
+        extra.update(early_exit=stt["early_exit"], partial_transcript=stt["early_exit"] is not None)
+    return stt["text"], cmp, extra
+
+
+def speech_to_text(audio, model=None, expected: str | None = None) -> str:
+    """
+    Whisper ile sesi çözümler ve metni döndürür.
+    audio: dosya yolu ya da 16 kHz float32 NumPy dizisi (dizi ise ffmpeg çalışmaz).
+    expected verilirse model cascade'i (STT_CASCADE) skoru da hesaba katar.
+    """
+    return transcribe_detailed(audio, model=model, expected=expected)["text"]
+
+
+# =========================
+# main evaluation function
+# =========================
+def build_result(prompt_id: int,
+                 audio_path: str,
+                 expected: str,
+                 user_text: str | None,
+                 cmp: dict,
+                 timings_ms: dict | None = None) -> dict:
+    """C# / CLI için sonuç dict'i."""
     result = {
         "prompt_id": prompt_id,
         "audio_path": audio_path,
@@ -237,22 +599,495 @@ def record_and_evaluate(prompt_id: int,
         "passed": cmp["passed"],
         "feedback": cmp["feedback"],
     }
+    if timings_ms is not None:
+        result["timings_ms"] = timings_ms
     return result
 
 
+def audio_hash(audio) -> str:
+    """recordings.audio_sha256: dosya baytlarının ya da 16 kHz PCM'in sha256'sı."""
+    import transcript_cache
+    return transcript_cache.audio_sha256(audio)
+
+
+def evaluate_audio(prompt_id: int, audio_path: str, model=None,
+                   user_id: str | None = None, mode: str | None = None) -> dict:
+    """
+    Var olan bir kaydı değerlendirir:
+    STT -> compare_texts -> recordings tablosu.
+    mode="verify" ile STT + compare yerine prompt metni puanlanır (EVAL_MODE).
+    """
+    import timings
+
+    timer = timings.StageTimer()
+    with timer.active():
+        with timer.stage("prompt_lookup"):
+            expected = get_prompt_by_id(prompt_id)
+        if not expected:
+            return {"error": "prompt_not_found", "prompt_id": prompt_id}
+
+        user_text, cmp, extra = _evaluate_stt(audio_path, expected, mode or EVAL_MODE, model)
+        with timer.stage("audio_hash"):
+            sha = audio_hash(audio_path)
+        with timer.stage("db_enqueue"):
+            saved = save_recording(prompt_id, audio_path, user_text, cmp, user_id=user_id,
+                                   audio_sha256=sha, mode=extra.get("mode", "transcribe"))
+        save_timings(saved, timer.as_ms())
+        with timer.stage("db_commit"):
+            write_status = wait_saved(saved)
+    return dict(build_result(prompt_id, audio_path, expected, user_text, cmp, timer.as_ms()),
+                **extra, **write_status)
+
+
+def record_and_evaluate(prompt_id: int,
+                        duration: int = RECORD_SECONDS,
+                        vad: bool = USE_VAD,
+                        on_partial=None,
+                        user_id: str | None = None,
+                        mode: str | None = None) -> dict:
+    """
+    1) prompt metnini DB’den çeker
+    2) mikrofondan ses kaydı alır
+    3) Whisper ile çözümler
+    4) compare_texts ile kıyaslar
+    5) recordings tablosuna yazar
+    6) sonucu dict olarak döndürür
+    on_partial verilirse kayıt VAD ile alınır ve konuşma sürerken
+    kısmi metin + skor bu callback'e gönderilir (2. ve 3. adım birlikte yürür).
+    Her aşamanın süresi sonuçta "timings_ms" olarak döner ve timings
+    tablosuna yazılır. Kayıt DB'ye yazılamazsa sonuç "error": "db_write_failed"
+    ile döner. mode="verify" (ya da EVAL_MODE) ile 3. ve 4. adım
+    yerine prompt metni tek decoder pass'inde puanlanır (streaming hariç).
+    """
+    import timings
+
+    timer = timings.StageTimer()
+    with timer.active():
+        with timer.stage("prompt_lookup"):
+            expected = get_prompt_by_id(prompt_id)
+        if not expected:
+            return {"error": "prompt_not_found", "prompt_id": prompt_id}
+
+        sha, extra = None, {}
+        if on_partial is not None:
+            # recording + streaming STT (kayıt ve çözme iç içe)
+            with timer.stage("record_streaming"):
+                user_text, audio_path = record_streaming(expected, on_partial)
+            # compare
+            with timer.stage("compare"):
+                cmp = compare_texts(expected, user_text)
+        else:
+            # recording (in memory, 16 kHz float32)
+            with timer.stage("record"):
+                audio, audio_path = record_for_whisper(duration=duration, vad=vad)
+
+            # STT + compare (ya da verify)
+            user_text, cmp, extra = _evaluate_stt(audio, expected, mode or EVAL_MODE)
+            with timer.stage("audio_hash"):
+                sha = audio_hash(audio)
+
+        # save to DB
+        with timer.stage("db_enqueue"):
+            saved = save_recording(prompt_id, audio_path, user_text, cmp, user_id=user_id,
+                                   audio_sha256=sha, mode=extra.get("mode", "transcribe"))
+        # anlık görüntü db_enqueue kapandıktan sonra: o da timings tablosuna girsin
+        save_timings(saved, timer.as_ms())
+        # sonuç ancak kayıt commit edilince döner (hata sessizce kaybolmasın)
+        with timer.stage("db_commit"):
+            write_status = wait_saved(saved)
+
+    # output for C# or CLI
+    return dict(build_result(prompt_id, audio_path, expected, user_text, cmp, timer.as_ms()),
+                **extra, **write_status)
+
+
+# =========================
+# Drill mode (closed-set recognition)
+# =========================
+def recognize_prompt(audio, top_k: int = RECOGNIZE_TOP_K, model=None) -> list:
+    """
+    Kursiyer prompts tablosundaki herhangi bir cümleyi söyleyebilir: ses bir
+    kez encode edilir, tüm prompt'lar aynı encoder çıktısı üzerinde puanlanır.
+    -> en olası top_k [{"prompt_id", "text", "logprob", "avg_logprob", "probability"}]
+    """
+    import prompt_scoring
+    import timings
+
+    with timings.stage("prompt_lookup"):
+        candidates = get_all_prompts()
+    if model is None:
+        with timings.stage("model_load"):
+            model = load_whisper_model()
+    return prompt_scoring.rank_prompts(model, audio, candidates, top_k=top_k)
+
+
+def recognize_audio(audio_path: str, top_k: int = RECOGNIZE_TOP_K, model=None) -> dict:
+    """Var olan bir kayıt için recognize_prompt."""
+    import timings
+
+    timer = timings.StageTimer()
+    with timer.active():
+        candidates = recognize_prompt(audio_path, top_k=top_k, model=model)
+    return {"audio_path": audio_path, "candidates": candidates, "timings_ms": timer.as_ms()}
+
+
+def record_and_recognize(top_k: int = RECOGNIZE_TOP_K,
+                         duration: int = RECORD_SECONDS,
+                         vad: bool = USE_VAD) -> dict:
+    """Mikrofondan kaydeder ve söylenen prompt'u tahmin eder (top_k aday)."""
+    import timings
+
+    timer = timings.StageTimer()
+    with timer.active():
+        with timer.stage("record"):
+            audio, audio_path = record_for_whisper(duration=duration, vad=vad)
+        candidates = recognize_prompt(audio, top_k=top_k)
+    return {"audio_path": audio_path, "candidates": candidates, "timings_ms": timer.as_ms()}
+
+
+# =========================
+# Persistent serve mode
+# =========================
+def transcribe_file(audio_path: str) -> dict:
+    """Var olan bir ses dosyasını çözümler."""
+    if not os.path.exists(audio_path):
+        return {"error": "file_not_found", "audio_path": audio_path}
+    return {"audio_path": audio_path, "recognized_text": speech_to_text(audio_path)}
+
+
+def _prompt_command(func):
+    def run(req: dict, emit=None) -> dict:
+        try:
+            prompt_id = int(req["prompt_id"])
+        except (KeyError, TypeError, ValueError):
+            return {"error": "invalid_prompt_id", "raw": req.get("prompt_id")}
+        return func(prompt_id)
+    return run
+
+
+def _transcribe_command(req: dict, emit=None) -> dict:
+    audio_path = req.get("audio_path")
+    if not audio_path:
+        return {"error": "missing_audio_path"}
+    return transcribe_file(audio_path)
+
+
+def _evaluate_file_command(req: dict, emit=None) -> dict:
+    audio_path = req.get("audio_path")
+    if not audio_path:
+        return {"error": "missing_audio_path"}
+    if not os.path.exists(audio_path):
+        return {"error": "file_not_found", "audio_path": audio_path}
+    mode = req.get("mode") or EVAL_MODE
+    if mode not in EVAL_MODES:
+        return {"error": "invalid_mode", "raw": mode}
+    return _prompt_command(
+        lambda pid: evaluate_audio(pid, audio_path, user_id=req.get("user_id"), mode=mode)
+    )(req)
+
+
+def _top_k(req: dict) -> int:
+    top_k = int(req.get("top_k", RECOGNIZE_TOP_K))
+    if top_k < 1:
+        raise ValueError(top_k)
+    return top_k
+
+
+def _recognize_file_command(req: dict, emit=None) -> dict:
+    audio_path = req.get("audio_path")
+    if not audio_path:
+        return {"error": "missing_audio_path"}
+    if not os.path.exists(audio_path):
+        return {"error": "file_not_found", "audio_path": audio_path}
+    try:
+        top_k = _top_k(req)
+    except (TypeError, ValueError):
+        return {"error": "invalid_top_k", "raw": req.get("top_k")}
+    return recognize_audio(audio_path, top_k=top_k)
+
+
+def _capture_options(req: dict) -> dict:
+    """
+    Kayıt isteğinden {"duration", "vad"} ya da hata dict'i.
+    "duration" verilip "vad" verilmezse eski sabit süreli kayıt alınır.
+    """
+    try:
+        duration = float(req.get("duration", RECORD_SECONDS))
+    except (TypeError, ValueError):
+        return {"error": "invalid_duration", "raw": req.get("duration")}
+    vad = req.get("vad", USE_VAD and "duration" not in req)
+    if not isinstance(vad, bool):
+        return {"error": "invalid_vad", "raw": vad}
+    return {"duration": duration, "vad": vad}
+
+
+def _record_and_recognize_command(req: dict, emit=None) -> dict:
+    try:
+        top_k = _top_k(req)
+    except (TypeError, ValueError):
+        return {"error": "invalid_top_k", "raw": req.get("top_k")}
+    capture = _capture_options(req)
+    if "error" in capture:
+        return capture
+    return record_and_recognize(top_k=top_k, **capture)
+
+
+def _prompt_stats_command(req: dict, emit=None) -> dict:
+    if req.get("prompt_id") is None:
+        return {"prompts": get_prompt_stats()}
+    try:
+        prompt_id = int(req["prompt_id"])
+    except (TypeError, ValueError):
+        return {"error": "invalid_prompt_id", "raw": req.get("prompt_id")}
+    return get_prompt_stats(prompt_id)
+
+
+def _user_stats_command(req: dict, emit=None) -> dict:
+    user_id = req.get("user_id")
+    if not user_id:
+        return {"error": "missing_user_id"}
+    return get_user_stats(str(user_id))
+
+
+def _leaderboard_command(req: dict, emit=None) -> dict:
+    try:
+        limit = int(req.get("limit", 10))
+        min_attempts = int(req.get("min_attempts", 1))
+    except (TypeError, ValueError):
+        return {"error": "invalid_limit", "raw": req.get("limit")}
+    return {"leaderboard": get_leaderboard(limit=limit, min_attempts=min_attempts)}
+
+
+def _timing_report_command(req: dict, emit=None) -> dict:
+    try:
+        hours = float(req["since_hours"]) if req.get("since_hours") is not None else None
+    except (TypeError, ValueError):
+        return {"error": "invalid_since_hours", "raw": req.get("since_hours")}
+    return timing_report(hours)
+
+
+def _record_command(req: dict, emit=None) -> dict:
+    capture = _capture_options(req)
+    if "error" in capture:
+        return capture
+    mode = req.get("mode") or EVAL_MODE
+    if mode not in EVAL_MODES:
+        return {"error": "invalid_mode", "raw": mode}
+
+    # streaming kayıt her zaman VAD ile alınır (record_streaming)
+    stream = bool(req.get("stream"))
+    if stream and not capture["vad"]:
+        return {"error": "stream_requires_vad", "vad": req.get("vad"), "duration": req.get("duration")}
+    on_partial = (lambda partial: emit(dict(partial, is_partial=True))) \
+        if stream and emit is not None else None
+
+    return _prompt_command(
+        lambda pid: record_and_evaluate(pid, on_partial=on_partial, user_id=req.get("user_id"),
+                                        mode=mode, **capture)
+    )(req)
+
+
+SERVE_COMMANDS = {
+    "play_prompt": _prompt_command(play_prompt),
+    "record_and_evaluate": _record_command,
+    "transcribe_file": _transcribe_command,
+    "evaluate_file": _evaluate_file_command,
+    "recognize_file": _recognize_file_command,
+    "record_and_recognize": _record_and_recognize_command,
+    "render_prompts": lambda req, emit=None: render_prompts(),
+    "prompt_stats": _prompt_stats_command,
+    "user_stats": _user_stats_command,
+    "leaderboard": _leaderboard_command,
+    "timing_report": _timing_report_command,
+    "ping": lambda req, emit=None: {"pong": True},
+}
+
+
+def handle_request(req: dict, emit=None) -> dict:
+    """
+    Tek bir serve isteğini çalıştırır, cevabı request id ile döndürür.
+    emit(dict) verilirse ara mesajlar (ör. "stream": true ile kısmi metinler)
+    aynı id ile final cevaptan önce gönderilir.
+    """
+    req_id = req.get("id")
+    cmd = req.get("command")
+    handler = SERVE_COMMANDS.get(cmd)
+    if handler is None:
+        out = {"error": "unknown_command", "command": cmd}
+    else:
+        try:
+            out = handler(req, emit=(lambda msg: emit(dict(msg, id=req_id))) if emit else None)
+        except Exception as e:
+            out = {"error": "internal_error", "command": cmd, "message": str(e)}
+    out["id"] = req_id
+    return out
+
+
+def serve(stdin=None, stdout=None, profile_modes: tuple = (), profile_dir: str | None = None) -> int:
+    """
+    Uzun ömürlü mod: stdin'den satır satır JSON istek okur,
+    her biri için stdout'a tek satır JSON cevap yazar.
+        {"id": 1, "command": "record_and_evaluate", "prompt_id": 3}
+    Whisper modeli, TTS engine ve DB bağlantısı istekler arasında açık kalır.
+    record_and_evaluate isteğine "stream": true eklenirse final cevaptan önce
+    aynı id ile {"is_partial": true, "partial_text": ..., "score": ...} satırları gelir
+    (streaming kayıt VAD'lidir; "vad": false ya da tek başına "duration" reddedilir).
+    profile_modes verilirse her istek ayrı ayrı profillenir (bkz. profiling.py).
+    """
+    import profiling
+
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    # whisper/pyttsx3 print'leri protokolü bozmasın
+    sys.stdout = sys.stderr
+
+    load_whisper_model()
+    get_db_connection()
+
+    write_lock = threading.Lock()
+
+    def reply(obj: dict) -> None:
+        # kısmi sonuçlar STT thread'inden gelir
+        with write_lock:
+            stdout.write(json.dumps(obj, ensure_ascii=False) + "\n")
+            stdout.flush()
+
+    reply({"id": None, "ready": True})
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            req = json.loads(line)
+        except ValueError:
+            reply({"id": None, "error": "invalid_json", "raw": line})
+            continue
+        if not isinstance(req, dict):
+            reply({"id": None, "error": "invalid_request", "raw": line})
+            continue
+        if req.get("command") == "shutdown":
+            reply({"id": req.get("id"), "shutdown": True})
+            break
+        with profiling.profiled(str(req.get("command")), profile_modes, profile_dir):
+            out = handle_request(req, emit=reply)
+        reply(out)
+    return 0
+
+
+# =========================
+# Startup cost report
+# =========================
+STARTUP_BUDGET_MS = 200     # non-STT commands should be ready within this
+# komut başına gereken (tembel) importlar
+COMMAND_IMPORTS = {
+    "play_prompt": ["tts_cache", "sounddevice"],
+    "render_prompts": ["tts_cache", "pyttsx3"],
+    "record_and_evaluate": ["audio_capture", "streaming_stt", "transcript_cache",
+                            "fuzzywuzzy.fuzz", "whisper"],
+}
+FAST_COMMANDS = ("play_prompt",)
+IMPORT_REPORT_MODULES = ["numpy", "sounddevice", "scipy.io.wavfile", "scipy.signal",
+                         "pyttsx3", "fuzzywuzzy.fuzz", "torch", "whisper"]
+
+
+def _cold_start_ms(modules: list, runs: int = 3) -> float | None:
+    """Yeni bir python sürecinde modules'u import etmenin toplam duvar süresi (en iyi run)."""
+    code = "; ".join(f"import {m}" for m in modules) or "pass"
+    best = None
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", code], cwd=BASE_DIR,
+                              capture_output=True, text=True)
+        elapsed = (time.perf_counter() - t0) * 1000
+        if proc.returncode != 0:
+            return None
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 1)
+
+
+def import_time_report(budget_ms: float = STARTUP_BUDGET_MS) -> dict:
+    """
+    Başlangıç maliyetini parçalar: boş yorumlayıcı, backend modülü,
+    tek tek ağır bağımlılıklar ve komut başına toplam soğuk başlangıç.
+    FAST_COMMANDS bütçeyi aşarsa "over_budget" dolu döner.
+    """
+    interpreter = _cold_start_ms([])
+    backend = _cold_start_ms(["communications_backend"])
+
+    modules = {}
+    for name in IMPORT_REPORT_MODULES:
+        total = _cold_start_ms([name], runs=1)
+        modules[name] = None if total is None or interpreter is None else round(total - interpreter, 1)
+
+    commands = {}
+    for cmd, deps in COMMAND_IMPORTS.items():
+        commands[cmd] = _cold_start_ms(["communications_backend"] + deps)
+
+    over_budget = [cmd for cmd in FAST_COMMANDS
+                   if commands.get(cmd) is not None and commands[cmd] > budget_ms]
+    return {
+        "budget_ms": budget_ms,
+        "interpreter_ms": interpreter,
+        "backend_module_ms": backend,
+        "module_import_ms": modules,      # None = not installed
+        "command_startup_ms": commands,
+        "over_budget": over_budget,
+    }
+
+
 # =========================
 # Basic CLI interface
 # =========================
 def main():
+    """
+    --profile[=cprofile,tracemalloc,torch] ve --profile-dir DIR (ya da
+    CLEARCOMS_PROFILE / CLEARCOMS_PROFILE_DIR) verilirse komut profillenir;
+    serve modunda her istek ayrı profillenir.
+    """
+    import profiling
+
+    try:
+        argv, modes, profile_dir = profiling.pop_cli_args(sys.argv[1:])
+    except ValueError as e:
+        print(json.dumps({"error": "invalid_profile", "message": str(e)}))
+        return 1
+    sys.argv = sys.argv[:1] + argv
+    if argv == ["serve"]:
+        return serve(profile_modes=modes, profile_dir=profile_dir)
+    with profiling.profiled(argv[0] if argv else "usage", modes, profile_dir):
+        return _cli()
+
+
+def _cli():
     """
     Konsoldan kullanım:
         python clearcoms_backend.py play_prompt 1
         python clearcoms_backend.py record_and_evaluate 1
+        python clearcoms_backend.py serve
+        python clearcoms_backend.py render_prompts
+        python clearcoms_backend.py import-time [budget_ms]
+        python clearcoms_backend.py timing-report [since_hours]
     Sonuçları JSON olarak print eder.
     """
+    if len(sys.argv) in (2, 3) and sys.argv[1] == "import-time":
+        budget = float(sys.argv[2]) if len(sys.argv) == 3 else STARTUP_BUDGET_MS
+        report = import_time_report(budget)
+        print(json.dumps(report, ensure_ascii=False))
+        # CI'da bütçe aşımı hata olarak görünsün
+        return 1 if report["over_budget"] else 0
+
+    if len(sys.argv) in (2, 3) and sys.argv[1] == "timing-report":
+        hours = float(sys.argv[2]) if len(sys.argv) == 3 else None
+        print(json.dumps(timing_report(hours), ensure_ascii=False, indent=2))
+        return 0
+
+    if len(sys.argv) == 2 and sys.argv[1] == "render_prompts":
+        print(json.dumps(render_prompts(), ensure_ascii=False))
+        return 0
+
     if len(sys.argv) < 3:
         # Hata durumunda da JSON dönelim ki C# tarafı şaşırmasın
-        print(json.dumps({"error": "usage", "message": "Usage: python clearcoms_backend.py <play_prompt|record_and_evaluate> <prompt_id>"}))
+        print(json.dumps({"error": "usage", "message": "Usage: python clearcoms_backend.py <play_prompt|record_and_evaluate> <prompt_id> | serve"}))
         return 1
 
     cmd = sys.argv[1]
@@ -1,38 +1,354 @@
+import json
+import os
+import random
 import sqlite3
+import sys
+import tempfile
+import time
 
-def database():
+# =====================
+# ŞEMA SÜRÜMLERİ
+# =====================
+# Her migration bir kez, sırayla çalışır; uygulanan son sürüm
+# PRAGMA user_version'da tutulur. Yeni şema değişikliği = listenin sonuna
+# yeni bir (sürüm, [sql, ...]) eklemek. Eski migration'lar değiştirilmez.
+MIGRATIONS = [
+    # v1: ilk şema
+    (1, [
+        """
+        CREATE TABLE IF NOT EXISTS prompts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            expected_text TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS recordings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prompt_id INTEGER,
+            file_path TEXT,
+            recognized_text TEXT,
+            score INTEGER,
+            ratio INTEGER,
+            partial INTEGER,
+            token_sort INTEGER,
+            passed BOOLEAN,
+            feedback TEXT,
+            FOREIGN KEY(prompt_id) REFERENCES prompts(id)
+        )
+        """,
+    ]),
+    # v2: zaman damgası, kullanıcı, ses hash'i + geçmiş / leaderboard index'leri.
+    # created_at unix zamanı (REAL); eski satırlarda NULL kalır.
+    (2, [
+        "ALTER TABLE recordings ADD COLUMN created_at REAL",
+        "ALTER TABLE recordings ADD COLUMN user_id TEXT",
+        "ALTER TABLE recordings ADD COLUMN audio_sha256 TEXT",
+        # prompt geçmişi / prompt başarı oranı: tablo satırına inmeden (covering)
+        """
+        CREATE INDEX IF NOT EXISTS idx_recordings_prompt_history
+        ON recordings(prompt_id, created_at, score, passed)
+        """,
+        # kullanıcı geçmişi + kullanıcı bazlı leaderboard
+        """
+        CREATE INDEX IF NOT EXISTS idx_recordings_user_history
+        ON recordings(user_id, created_at, prompt_id, score, passed)
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_recordings_audio_sha256 ON recordings(audio_sha256)",
+    ]),
+    # v3: prompt ve kullanıcı başına özet istatistikler. recordings'e yapılan
+    # her insert/delete trigger ile yansır; dashboard sorguları geçmişin
+    # boyutundan bağımsız olarak tek satır okur. (Silmede last_attempt_*
+    # geri alınmaz.)
+    (3, [
+        """
+        CREATE TABLE IF NOT EXISTS prompt_stats (
+            prompt_id INTEGER PRIMARY KEY,
+            attempts INTEGER NOT NULL,
+            passes INTEGER NOT NULL,
+            score_sum REAL NOT NULL,
+            score_sq_sum REAL NOT NULL,
+            last_attempt_at REAL,
+            last_recording_id INTEGER
+        )
+        """,
+        """
+        INSERT INTO prompt_stats
+        SELECT prompt_id, COUNT(*), SUM(CASE WHEN passed THEN 1 ELSE 0 END),
+               SUM(COALESCE(score, 0)), SUM(COALESCE(score, 0) * COALESCE(score, 0)),
+               MAX(created_at), MAX(id)
+        FROM recordings WHERE prompt_id IS NOT NULL GROUP BY prompt_id
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_recordings_prompt_stats_insert
+        AFTER INSERT ON recordings WHEN NEW.prompt_id IS NOT NULL
+        BEGIN
+            INSERT INTO prompt_stats VALUES (
+                NEW.prompt_id, 1, CASE WHEN NEW.passed THEN 1 ELSE 0 END,
+                COALESCE(NEW.score, 0), COALESCE(NEW.score, 0) * COALESCE(NEW.score, 0),
+                NEW.created_at, NEW.id)
+            ON CONFLICT(prompt_id) DO UPDATE SET
+                attempts = attempts + 1,
+                passes = passes + excluded.passes,
+                score_sum = score_sum + excluded.score_sum,
+                score_sq_sum = score_sq_sum + excluded.score_sq_sum,
+                last_attempt_at = COALESCE(excluded.last_attempt_at, last_attempt_at),
+                last_recording_id = excluded.last_recording_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_recordings_prompt_stats_delete
+        AFTER DELETE ON recordings WHEN OLD.prompt_id IS NOT NULL
+        BEGIN
+            UPDATE prompt_stats SET
+                attempts = attempts - 1,
+                passes = passes - CASE WHEN OLD.passed THEN 1 ELSE 0 END,
+                score_sum = score_sum - COALESCE(OLD.score, 0),
+                score_sq_sum = score_sq_sum - COALESCE(OLD.score, 0) * COALESCE(OLD.score, 0)
+            WHERE prompt_id = OLD.prompt_id;
+            DELETE FROM prompt_stats WHERE prompt_id = OLD.prompt_id AND attempts <= 0;
+        END
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id TEXT PRIMARY KEY,
+            attempts INTEGER NOT NULL,
+            passes INTEGER NOT NULL,
+            score_sum REAL NOT NULL,
+            score_sq_sum REAL NOT NULL,
+            last_attempt_at REAL,
+            last_recording_id INTEGER
+        )
+        """,
+        """
+        INSERT INTO user_stats
+        SELECT user_id, COUNT(*), SUM(CASE WHEN passed THEN 1 ELSE 0 END),
+               SUM(COALESCE(score, 0)), SUM(COALESCE(score, 0) * COALESCE(score, 0)),
+               MAX(created_at), MAX(id)
+        FROM recordings WHERE user_id IS NOT NULL GROUP BY user_id
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_recordings_user_stats_insert
+        AFTER INSERT ON recordings WHEN NEW.user_id IS NOT NULL
+        BEGIN
+            INSERT INTO user_stats VALUES (
+                NEW.user_id, 1, CASE WHEN NEW.passed THEN 1 ELSE 0 END,
+                COALESCE(NEW.score, 0), COALESCE(NEW.score, 0) * COALESCE(NEW.score, 0),
+                NEW.created_at, NEW.id)
+            ON CONFLICT(user_id) DO UPDATE SET
+                attempts = attempts + 1,
+                passes = passes + excluded.passes,
+                score_sum = score_sum + excluded.score_sum,
+                score_sq_sum = score_sq_sum + excluded.score_sq_sum,
+                last_attempt_at = COALESCE(excluded.last_attempt_at, last_attempt_at),
+                last_recording_id = excluded.last_recording_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_recordings_user_stats_delete
+        AFTER DELETE ON recordings WHEN OLD.user_id IS NOT NULL
+        BEGIN
+            UPDATE user_stats SET
+                attempts = attempts - 1,
+                passes = passes - CASE WHEN OLD.passed THEN 1 ELSE 0 END,
+                score_sum = score_sum - COALESCE(OLD.score, 0),
+                score_sq_sum = score_sq_sum - COALESCE(OLD.score, 0) * COALESCE(OLD.score, 0)
+            WHERE user_id = OLD.user_id;
+            DELETE FROM user_stats WHERE user_id = OLD.user_id AND attempts <= 0;
+        END
+        """,
+    ]),
+    # v4: kayıt başına aşama süreleri (ms), bkz. timings.py
+    (4, [
+        """
+        CREATE TABLE IF NOT EXISTS timings (
+            recording_id INTEGER NOT NULL REFERENCES recordings(id),
+            stage TEXT NOT NULL,
+            ms REAL NOT NULL,
+            PRIMARY KEY (recording_id, stage)
+        )
+        """,
+        # yüzdelik raporu: aşama başına sıralı tarama
+        "CREATE INDEX IF NOT EXISTS idx_timings_stage_ms ON timings(stage, ms)",
+    ]),
+    # v5: kaydı üreten değerlendirme modu. "verify" skoru (hedef kelimelerin
+    # söylenme oranı) compare_texts skoruyla karşılaştırılamaz; prompt_stats /
+    # user_stats sadece "transcribe" satırlarından beslenir, verify satırları
+    # recordings'te mode ile ayrı sorgulanır. NULL = "transcribe" (eski yazıcılar).
+    # v5 öncesi verify satırları ratio/partial/token_sort'u boş olan skorlu
+    # satırlardır (compare_texts bunları her zaman doldurur).
+    (5, [
+        "ALTER TABLE recordings ADD COLUMN mode TEXT DEFAULT 'transcribe'",
+        """
+        UPDATE recordings SET mode = 'verify'
+        WHERE score IS NOT NULL AND ratio IS NULL AND partial IS NULL AND token_sort IS NULL
+        """,
+        "DROP TRIGGER IF EXISTS trg_recordings_prompt_stats_insert",
+        "DROP TRIGGER IF EXISTS trg_recordings_prompt_stats_delete",
+        "DROP TRIGGER IF EXISTS trg_recordings_user_stats_insert",
+        "DROP TRIGGER IF EXISTS trg_recordings_user_stats_delete",
+        "DELETE FROM prompt_stats",
+        """
+        INSERT INTO prompt_stats
+        SELECT prompt_id, COUNT(*), SUM(CASE WHEN passed THEN 1 ELSE 0 END),
+               SUM(COALESCE(score, 0)), SUM(COALESCE(score, 0) * COALESCE(score, 0)),
+               MAX(created_at), MAX(id)
+        FROM recordings
+        WHERE prompt_id IS NOT NULL AND COALESCE(mode, 'transcribe') = 'transcribe'
+        GROUP BY prompt_id
+        """,
+        "DELETE FROM user_stats",
+        """
+        INSERT INTO user_stats
+        SELECT user_id, COUNT(*), SUM(CASE WHEN passed THEN 1 ELSE 0 END),
+               SUM(COALESCE(score, 0)), SUM(COALESCE(score, 0) * COALESCE(score, 0)),
+               MAX(created_at), MAX(id)
+        FROM recordings
+        WHERE user_id IS NOT NULL AND COALESCE(mode, 'transcribe') = 'transcribe'
+        GROUP BY user_id
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_recordings_prompt_stats_insert
+        AFTER INSERT ON recordings
+        WHEN NEW.prompt_id IS NOT NULL AND COALESCE(NEW.mode, 'transcribe') = 'transcribe'
+        BEGIN
+            INSERT INTO prompt_stats VALUES (
+                NEW.prompt_id, 1, CASE WHEN NEW.passed THEN 1 ELSE 0 END,
+                COALESCE(NEW.score, 0), COALESCE(NEW.score, 0) * COALESCE(NEW.score, 0),
+                NEW.created_at, NEW.id)
+            ON CONFLICT(prompt_id) DO UPDATE SET
+                attempts = attempts + 1,
+                passes = passes + excluded.passes,
+                score_sum = score_sum + excluded.score_sum,
+                score_sq_sum = score_sq_sum + excluded.score_sq_sum,
+                last_attempt_at = COALESCE(excluded.last_attempt_at, last_attempt_at),
+                last_recording_id = excluded.last_recording_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_recordings_prompt_stats_delete
+        AFTER DELETE ON recordings
+        WHEN OLD.prompt_id IS NOT NULL AND COALESCE(OLD.mode, 'transcribe') = 'transcribe'
+        BEGIN
+            UPDATE prompt_stats SET
+                attempts = attempts - 1,
+                passes = passes - CASE WHEN OLD.passed THEN 1 ELSE 0 END,
+                score_sum = score_sum - COALESCE(OLD.score, 0),
+                score_sq_sum = score_sq_sum - COALESCE(OLD.score, 0) * COALESCE(OLD.score, 0)
+            WHERE prompt_id = OLD.prompt_id;
+            DELETE FROM prompt_stats WHERE prompt_id = OLD.prompt_id AND attempts <= 0;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_recordings_user_stats_insert
+        AFTER INSERT ON recordings
+        WHEN NEW.user_id IS NOT NULL AND COALESCE(NEW.mode, 'transcribe') = 'transcribe'
+        BEGIN
+            INSERT INTO user_stats VALUES (
+                NEW.user_id, 1, CASE WHEN NEW.passed THEN 1 ELSE 0 END,
+                COALESCE(NEW.score, 0), COALESCE(NEW.score, 0) * COALESCE(NEW.score, 0),
+                NEW.created_at, NEW.id)
+            ON CONFLICT(user_id) DO UPDATE SET
+                attempts = attempts + 1,
+                passes = passes + excluded.passes,
+                score_sum = score_sum + excluded.score_sum,
+                score_sq_sum = score_sq_sum + excluded.score_sq_sum,
+                last_attempt_at = COALESCE(excluded.last_attempt_at, last_attempt_at),
+                last_recording_id = excluded.last_recording_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_recordings_user_stats_delete
+        AFTER DELETE ON recordings
+        WHEN OLD.user_id IS NOT NULL AND COALESCE(OLD.mode, 'transcribe') = 'transcribe'
+        BEGIN
+            UPDATE user_stats SET
+                attempts = attempts - 1,
+                passes = passes - CASE WHEN OLD.passed THEN 1 ELSE 0 END,
+                score_sum = score_sum - COALESCE(OLD.score, 0),
+                score_sq_sum = score_sq_sum - COALESCE(OLD.score, 0) * COALESCE(OLD.score, 0)
+            WHERE user_id = OLD.user_id;
+            DELETE FROM user_stats WHERE user_id = OLD.user_id AND attempts <= 0;
+        END
+        """,
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Eksik migration'ları uygular, son şema sürümünü döndürür.
+    Her sürüm kendi transaction'ında çalışır; yarıda kalan sürüm geri alınır.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    current = schema_version(conn)
+    for version, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # başka bir process aynı anda yükseltmiş olabilir
+            if schema_version(conn) >= version:
+                conn.execute("ROLLBACK")
+                current = schema_version(conn)
+                continue
+            for sql in statements:
+                conn.execute(sql)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        current = version
+    return current
+
+
+# =====================
+# SIK KULLANILAN SORGULAR
+# =====================
+QUERIES = {
+    "prompt_history": """
+        SELECT created_at, score, passed FROM recordings
+        WHERE prompt_id = ? ORDER BY created_at DESC LIMIT 20
+    """,
+    "user_history": """
+        SELECT prompt_id, created_at, score, passed FROM recordings
+        WHERE user_id = ? ORDER BY created_at DESC LIMIT 20
+    """,
+    "prompt_pass_rate": """
+        SELECT COUNT(*), SUM(passed), AVG(score) FROM recordings WHERE prompt_id = ?
+    """,
+    "leaderboard": """
+        SELECT user_id, COUNT(*), SUM(passed), AVG(score) FROM recordings
+        WHERE user_id IS NOT NULL GROUP BY user_id ORDER BY AVG(score) DESC LIMIT 10
+    """,
+    # v3 özet tabloları üzerinden aynı bilgiler
+    "prompt_stats": """
+        SELECT attempts, passes, score_sum, score_sq_sum, last_attempt_at
+        FROM prompt_stats WHERE prompt_id = ?
+    """,
+    "leaderboard_stats": """
+        SELECT user_id, attempts, passes, score_sum / attempts AS avg_score FROM user_stats
+        WHERE attempts >= ? ORDER BY avg_score DESC LIMIT 10
+    """,
+}
+
+
+def database(path="speech_eval_small.db"):
     # =====================
     # 1. DATABASE KURULUMU
     # =====================
-    conn = sqlite3.connect("speech_eval_small.db")
+    conn = sqlite3.connect(path, isolation_level=None)
+    version = migrate(conn)
+    print(f"Şema sürümü: {version}")
     c = conn.cursor()
 
-    # Prompts tablosu: hedef cümleler
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS prompts (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        expected_text TEXT
-    )
-    """)
-
-    # Recordings tablosu: sonuçlar
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS recordings (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        prompt_id INTEGER,
-        file_path TEXT,
-        recognized_text TEXT,
-        score INTEGER,
-        ratio INTEGER,
-        partial INTEGER,
-        token_sort INTEGER,
-        passed BOOLEAN,
-        feedback TEXT,
-        FOREIGN KEY(prompt_id) REFERENCES prompts(id)
-    )
-    """)
-    conn.commit()
-
     # ==============================
     # 3. PROMPT EKLEME (10 CÜMLE)
     # ==============================
@@ -53,11 +369,107 @@ def database():
     c.execute("SELECT COUNT(*) FROM prompts")
     count = c.fetchone()[0]
     if count == 0:
-        for s in sentences:
-            c.execute("INSERT INTO prompts (expected_text) VALUES (?)", (s,))
-        conn.commit()
+        with conn:
+            for s in sentences:
+                c.execute("INSERT INTO prompts (expected_text) VALUES (?)", (s,))
         print("10 örnek cümle eklendi ✅")
     else:
-        print("Prompts zaten var, ekleme yapılmadı.") 
- 
-database()
\ No newline at end of file
+        print("Prompts zaten var, ekleme yapılmadı.")
+    conn.close()
+
+
+# =====================
+# BENCHMARK
+# =====================
+def _fill(conn: sqlite3.Connection, n_rows: int, n_prompts: int, n_users: int) -> None:
+    rnd = random.Random(0)
+    start = time.time() - n_rows
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO prompts (expected_text) VALUES (?)",
+        ((f"prompt {i}",) for i in range(n_prompts)),
+    )
+    rows = []
+    for i in range(n_rows):
+        score = rnd.randint(0, 100)
+        rows.append((rnd.randint(1, n_prompts), f"rec{i}.wav", "text", score, score,
+                     score, score, score >= 80, "", start + i,
+                     f"user{rnd.randint(1, n_users)}", None))
+        if len(rows) == 10000:
+            _insert_rows(conn, rows)
+            rows = []
+    _insert_rows(conn, rows)
+    conn.execute("COMMIT")
+
+
+def _insert_rows(conn, rows) -> None:
+    conn.executemany(
+        """INSERT INTO recordings
+        (prompt_id, file_path, recognized_text, score, ratio, partial, token_sort,
+         passed, feedback, created_at, user_id, audio_sha256)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        rows,
+    )
+
+
+def _time_queries(conn: sqlite3.Connection, repeat: int) -> dict:
+    params = {"prompt_history": (5,), "user_history": ("user7",),
+              "prompt_pass_rate": (5,), "leaderboard": (),
+              "prompt_stats": (5,), "leaderboard_stats": (1,)}
+    out = {}
+    for name, sql in QUERIES.items():
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            conn.execute(sql, params[name]).fetchall()
+            best = min(best, time.perf_counter() - t0)
+        plan = conn.execute("EXPLAIN QUERY PLAN " + sql, params[name]).fetchall()
+        out[name] = {"ms": round(best * 1000, 3), "plan": [row[-1] for row in plan]}
+    return out
+
+
+def benchmark(n_rows=1_000_000, n_prompts=10, n_users=200, repeat=5) -> dict:
+    """
+    Geçici bir DB'ye n_rows sentetik kayıt yazar ve QUERIES'i
+    index'siz (v2 kolonları, index yok) ve index'li olarak ölçer.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"), isolation_level=None)
+        migrate(conn)
+        index_sql = [sql for _, statements in MIGRATIONS for sql in statements
+                     if "CREATE INDEX" in sql]
+        for (name,) in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'").fetchall():
+            conn.execute(f"DROP INDEX {name}")
+
+        t0 = time.perf_counter()
+        _fill(conn, n_rows, n_prompts, n_users)
+        fill_s = time.perf_counter() - t0
+        conn.execute("ANALYZE")
+        without = _time_queries(conn, repeat)
+
+        t0 = time.perf_counter()
+        for sql in index_sql:
+            conn.execute(sql)
+        conn.execute("ANALYZE")
+        index_s = time.perf_counter() - t0
+        with_idx = _time_queries(conn, repeat)
+        conn.close()
+
+    return {
+        "rows": n_rows,
+        "fill_seconds": round(fill_s, 2),
+        "index_build_seconds": round(index_s, 2),
+        "without_indexes": without,
+        "with_indexes": with_idx,
+    }
+
+
+if __name__ == "__main__":
+    # python create_db.py               -> speech_eval_small.db kur / yükselt
+    # python create_db.py benchmark [N] -> N kayıtlık sorgu ölçümü (varsayılan 1M)
+    if len(sys.argv) >= 2 and sys.argv[1] == "benchmark":
+        n = int(sys.argv[2]) if len(sys.argv) >= 3 else 1_000_000
+        print(json.dumps(benchmark(n), indent=2, ensure_ascii=False))
+    else:
+        database()
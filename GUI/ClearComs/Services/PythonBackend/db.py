@@ -0,0 +1,239 @@
+"""
+Ortak SQLite katmanı.
+
+- Okuma: her thread için açık tutulan bir bağlantı (WAL modunda; okuyucular
+  yazarı, yazar okuyucuları bloklamaz).
+- Yazma: bütün recordings insert'leri tek bir yazar thread'inin kuyruğundan
+  geçer; kuyruktaki satırlar tek transaction'da toplu commit edilir.
+  Böylece çok sayıda değerlendirme aynı anda bittiğinde "database is locked"
+  beklemeleri olmaz. Toplu commit hata verirse satırlar tek tek yeniden
+  denenir (tek hatalı satır diğerlerini kaybettirmez); yine de yazılamayan
+  her satır stderr'e loglanır. Sonucu kullanıcıya gösterilen yollar
+  Future'ı bekler (wait_for_write).
+
+    db.get_connection(path).execute("SELECT ...")
+    future = db.insert_recording(path, row)   # future.result() -> recording id
+"""
+import atexit
+import functools
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+import create_db
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(BASE_DIR, "speech_eval_small.db")
+BUSY_TIMEOUT_MS = 5000
+WRITE_BATCH_SIZE = 64
+WRITE_BATCH_MS = 20
+
+RECORDING_COLUMNS = ("prompt_id", "file_path", "recognized_text", "score", "ratio",
+                     "partial", "token_sort", "passed", "feedback",
+                     "created_at", "user_id", "audio_sha256", "mode")
+
+_local = threading.local()
+_writers = {}
+_writers_lock = threading.Lock()
+_migrated = set()
+_migrate_lock = threading.Lock()
+
+
+def open_database(path: str) -> sqlite3.Connection:
+    """
+    Yeni (paylaşılmayan) bağlantı: WAL pragmaları ve eksik migration'lar
+    uygulanmış olarak. Kapatmak çağıranın işidir.
+    """
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000)
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    _ensure_schema(path, conn)
+    return conn
+
+
+def _ensure_schema(path: str, conn: sqlite3.Connection) -> None:
+    """Process başına DB dosyası başına bir kez: eksik migration'ları uygular."""
+    key = os.path.abspath(path)
+    if key in _migrated:
+        return
+    with _migrate_lock:
+        if key not in _migrated:
+            create_db.migrate(conn)
+            _migrated.add(key)
+
+
+def get_connection(path: str = DB_PATH) -> sqlite3.Connection:
+    """Bu thread'e ait (açık kalan) bağlantı."""
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    key = os.path.abspath(path)
+    conn = conns.get(key)
+    if conn is None:
+        conn = conns[key] = open_database(path)
+    return conn
+
+
+class Writer:
+    """
+    Tek yazar thread'i. write() hemen döner (write-behind);
+    dönen Future satırın lastrowid'si ile tamamlanır.
+    """
+
+    def __init__(self, path: str, batch_size: int = WRITE_BATCH_SIZE,
+                 batch_ms: float = WRITE_BATCH_MS):
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_ms = batch_ms
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name=f"sqlite-writer:{os.path.basename(path)}")
+        self._thread.start()
+
+    def write(self, sql: str, params=()) -> Future:
+        future = Future()
+        # Future'ı kimse beklemese de hata kaybolmasın
+        future.add_done_callback(functools.partial(_log_failure, self.path, sql))
+        self._queue.put((sql, params, future))
+        return future
+
+    def flush(self) -> None:
+        """Kuyruktaki her şey commit edilene kadar bekler."""
+        self._queue.join()
+
+    def _next_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_ms / 1000
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        conn = open_database(self.path)
+        while True:
+            batch = self._next_batch()
+            try:
+                try:
+                    with conn:
+                        ids = [conn.execute(sql, params).lastrowid for sql, params, _ in batch]
+                except Exception:
+                    # batch rollback oldu: satırları kendi transaction'larında yeniden dene
+                    self._write_each(conn, batch)
+                else:
+                    for (_, _, future), row_id in zip(batch, ids):
+                        future.set_result(row_id)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    @staticmethod
+    def _write_each(conn: sqlite3.Connection, batch: list) -> None:
+        for sql, params, future in batch:
+            try:
+                with conn:
+                    row_id = conn.execute(sql, params).lastrowid
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(row_id)
+
+
+def _log_failure(path: str, sql: str, future: Future) -> None:
+    error = future.exception()
+    if error is not None:
+        table = sql.split("(")[0].strip()
+        print(f"[db] {os.path.basename(path)}: {table} failed: {error!r}", file=sys.stderr)
+
+
+def wait_for_write(future: Future, timeout: float | None = BUSY_TIMEOUT_MS * 2 / 1000):
+    """
+    Write-behind insert'in commit'ini bekler -> (recording id, None) ya da
+    (None, hata mesajı). Sonucu kullanıcıya dönen yollar kaydın
+    yazılamadığını sessizce kaybetmesin diye.
+    """
+    try:
+        return future.result(timeout=timeout), None
+    except Exception as e:
+        return None, str(e) or repr(e)
+
+
+def get_writer(path: str = DB_PATH) -> Writer:
+    key = os.path.abspath(path)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = Writer(path)
+        return writer
+
+
+def insert_recording(path: str, row: dict, timings: dict | None = None) -> Future:
+    """
+    recordings tablosuna write-behind insert; Future -> yeni recording id.
+    created_at verilmezse kuyruğa girdiği an, mode verilmezse "transcribe" yazılır.
+    timings ({aşama: ms}) verilirse satır commit edilince yeni id ile timings
+    tablosuna yazılır (bkz. attach_timings).
+    """
+    row = dict(row)
+    if row.get("created_at") is None:
+        row["created_at"] = time.time()
+    if row.get("mode") is None:
+        row["mode"] = "transcribe"
+    sql = (f"INSERT INTO recordings ({', '.join(RECORDING_COLUMNS)}) "
+           f"VALUES ({', '.join('?' for _ in RECORDING_COLUMNS)})")
+    writer = get_writer(path)
+    future = writer.write(sql, tuple(row.get(c) for c in RECORDING_COLUMNS))
+    if timings:
+        attach_timings(path, future, timings, writer=writer)
+    return future
+
+
+def attach_timings(path: str, future: Future, stages: dict, writer: Writer | None = None) -> None:
+    """
+    insert_recording'in satırı commit edilince stages'i ({aşama: ms}) yeni id
+    ile timings tablosuna yazar; buradan commit'e kadar geçen süre "db_commit".
+    Kuyruğa ekleme de ölçülecekse anlık görüntü o aşama kapandıktan sonra alınır:
+        with timer.stage("db_enqueue"):
+            future = db.insert_recording(path, row)
+        db.attach_timings(path, future, timer.as_ms())
+    """
+    queued_at = time.monotonic()
+
+    def write_timings(f: Future) -> None:
+        if f.exception() is not None:
+            return
+        done = dict(stages, db_commit=round((time.monotonic() - queued_at) * 1000, 1))
+        insert_timings(path, f.result(), done, writer=writer)
+
+    future.add_done_callback(write_timings)
+
+
+def insert_timings(path: str, recording_id: int, stages: dict, writer: Writer | None = None) -> Future:
+    """{aşama: ms} -> timings tablosu (tek insert)."""
+    items = list(stages.items())
+    sql = ("INSERT OR REPLACE INTO timings (recording_id, stage, ms) VALUES "
+           + ", ".join("(?, ?, ?)" for _ in items))
+    params = tuple(v for stage, ms in items for v in (recording_id, stage, ms))
+    return (writer or get_writer(path)).write(sql, params)
+
+
+def flush_all() -> None:
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.flush()
+
+
+# tek seferlik CLI çıkarken kuyrukta kayıt kalmasın
+atexit.register(flush_all)
@@ -0,0 +1,102 @@
+"""
+Beklenen cümleye karşı erken çıkışlı (early-exit) decode.
+
+Telsiz cümleleri kısa ve hedef metin belli. Greedy decode her token'dan
+sonra büyüyen hipotezi expected_text ile karşılaştırır ve sonuç belli
+olunca durur:
+  - "pass": hipotezin kelimeleri hedefinkilerle birebir aynı ve model emin
+    (ortalama token log-olasılığı MIN_LOGPROB üstünde). Sondaki token'lar
+    ve halüsinasyon dolgusu decode edilmez.
+  - "fail": tamamlanmış kelimelere hedefin kalanı en iyi şekilde eklense
+    bile compare skoru PASS_THRESHOLD - FAIL_MARGIN'e ulaşamıyor.
+Erken çıkışta dönen metin kısmi transkripttir ("early_exit" ile işaretli).
+
+    result = early_exit.decode(model, audio, "Turn left heading 090.")
+    result["text"], result["early_exit"]      # "Turn left heading 090.", "pass"
+
+"fail" sınırı bir tahmindir: kalan sesin hedefin kalan kelimeleriyle
+(herhangi bir noktadan itibaren) tam uyuştuğu en iyi durum varsayılır.
+"""
+import numpy as np
+from whisper.audio import N_SAMPLES
+
+from speculative import IncrementalDecoder
+
+
+PASS_THRESHOLD = 80
+FAIL_MARGIN = 5             # en iyi durum skoru eşiğin bu kadar altındaysa "fail"
+MIN_WORDS = 2               # bu kadar kelime tamamlanmadan "fail" denmez
+MIN_LOGPROB = -0.5          # "pass" için ortalama token log-olasılığı
+
+
+def _score(expected: str, hypothesis: str) -> int:
+    from compare import compare_texts
+    return compare_texts(expected, hypothesis)["score"]
+
+
+def _normalize(words: list) -> list:
+    return ["".join(c for c in w.lower() if c.isalnum()) for w in words]
+
+
+def best_case_score(expected: str, done_words: list, score=_score) -> int:
+    """Tamamlanmış kelimeler + hedefin (herhangi bir kelimesinden itibaren) kalanı: en yüksek skor."""
+    exp_words = expected.split()
+    return max(score(expected, " ".join(done_words + exp_words[j:]))
+               for j in range(len(exp_words) + 1))
+
+
+def decision(expected: str, text: str, avg_logprob: float, check_fail: bool = True,
+             pass_threshold: int = PASS_THRESHOLD, score=_score) -> str | None:
+    """Hipotez için "pass", "fail" ya da None (devam)."""
+    words = text.split()
+    target = [w for w in _normalize(expected.split()) if w]
+    if [w for w in _normalize(words) if w] == target and avg_logprob >= MIN_LOGPROB:
+        return "pass"
+    # son kelime hâlâ yazılıyor olabilir ("take" -> "takeoff"): sadece tamamlanmışlar
+    done = words[:-1]
+    if check_fail and len(done) >= MIN_WORDS and \
+            best_case_score(expected, done, score) < pass_threshold - FAIL_MARGIN:
+        return "fail"
+    return None
+
+
+def decode(model, audio: np.ndarray, expected: str, language: str = "en",
+           pass_threshold: int = PASS_THRESHOLD, score=_score) -> dict:
+    """
+    30 sn'ye sığan kaydı greedy decode eder; her token'dan sonra decision()'a
+    bakar ("fail" kontrolü sadece yeni bir kelime başladığında).
+    -> {"text", "tokens", "early_exit": "pass" | "fail" | None, "avg_logprob"}
+    early_exit None ise decode <eot>'a kadar normal bitmiştir.
+    score(expected, hypothesis) -> 0-100 (varsayılan compare.compare_texts skoru).
+    """
+    if len(audio) > N_SAMPLES:
+        raise ValueError("early-exit decoding handles clips up to 30 s")
+
+    dec = IncrementalDecoder(model, audio, language)
+    tokenizer = dec.tokenizer
+    tokens = list(dec.task.initial_tokens)
+    begin = len(tokens)
+    max_len = begin + dec.task.sample_len
+    logprobs = []
+    verdict = None
+
+    logits = dec.feed(tokens)[-1]
+    while len(tokens) < max_len:
+        token = dec.pick(tokens, logits)
+        if token == tokenizer.eot:
+            break
+        tokens.append(token)
+        logprobs.append(logits.log_softmax(dim=-1)[token].item())
+        new_word = tokenizer.decode([token]).startswith(" ")
+        verdict = decision(expected, tokenizer.decode(tokens[begin:]),
+                           sum(logprobs) / len(logprobs), new_word, pass_threshold, score)
+        if verdict is not None or len(tokens) == max_len:
+            break
+        logits = dec.feed([token])[-1]
+
+    return {
+        "text": tokenizer.decode(tokens[begin:]).strip(),
+        "tokens": tokens[begin:],
+        "early_exit": verdict,
+        "avg_logprob": round(sum(logprobs) / len(logprobs), 3) if logprobs else None,
+    }
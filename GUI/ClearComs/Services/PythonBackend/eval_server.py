@@ -0,0 +1,467 @@
+"""
+Sınıf ortamı için değerlendirme sunucusu.
+
+Birden fazla kursiyerin aynı anda ses gönderip sonuç alabilmesi için
+communications_backend etrafında küçük bir asyncio sunucusu.
+Protokol serve moduyla aynı: her satır bir JSON istek, her satır bir JSON cevap
+(cevaplar "id" ile eşleşir, sıraları farklı olabilir).
+
+    {"id": 1, "command": "evaluate", "prompt_id": 3, "audio_path": "/tmp/take.wav"}
+    {"id": 2, "command": "transcribe", "audio_b64": "<wav bytes>", "deadline_ms": 8000}
+
+audio_b64 bir WAV ise bellekte 16 kHz float32'ye çevrilir (ffmpeg çalışmaz).
+
+Kuyruk doluysa istek beklemeden {"error": "busy"} ile reddedilir.
+Worker'lar kuyrukta bekleyen kayıtları birkaç milisaniye toplayıp
+tek bir Whisper batch'i olarak çözer (bkz. whisper_batch).
+
+Kullanım:
+    python eval_server.py --port 8765 --workers 2 --queue-size 32 --max-batch 8
+    python eval_server.py --unix /tmp/clearcoms.sock
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+import functools
+import io
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from scipy.io import wavfile
+
+import audio_capture
+import communications_backend as backend
+import model_registry
+import transcript_cache
+import whisper_batch
+
+
+# =========================
+# settings
+# =========================
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 1
+DEFAULT_QUEUE_SIZE = 32
+DEFAULT_DEADLINE_MS = 30000
+DEFAULT_MAX_BATCH = 8
+DEFAULT_BATCH_WINDOW_MS = 5
+
+JOB_COMMANDS = ("evaluate", "transcribe")
+
+
+class Job:
+    """Kuyrukta bekleyen tek bir STT/değerlendirme işi."""
+
+    def __init__(self, command: str, prompt_id, audio, audio_path,
+                 cleanup: bool, deadline: float, future: asyncio.Future):
+        self.command = command
+        self.prompt_id = prompt_id
+        self.audio = audio              # Whisper girişi: dosya yolu ya da 16 kHz dizi
+        self.audio_path = audio_path    # DB'ye yazılan yol (yoksa None)
+        self.cleanup = cleanup
+        self.deadline = deadline
+        self.future = future
+        self.expected = None
+        self.user_id = None
+
+
+class EvaluationServer:
+    """
+    Sınırlı bir iş kuyruğu ve sabit sayıda inference worker'ı.
+    Her worker kendi tek thread'li executor'ında kendi Whisper modelini tutar;
+    aynı model nesnesi thread'ler arasında paylaşılmaz.
+    Kayıtlar db.py'deki tek yazar kuyruğuna gider (toplu commit).
+    """
+
+    def __init__(self,
+                 workers: int = DEFAULT_WORKERS,
+                 queue_size: int = DEFAULT_QUEUE_SIZE,
+                 deadline_ms: int = DEFAULT_DEADLINE_MS,
+                 max_batch: int = DEFAULT_MAX_BATCH,
+                 batch_window_ms: float = DEFAULT_BATCH_WINDOW_MS):
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.deadline_ms = deadline_ms
+        self.max_batch = max(1, max_batch)
+        self.batch_window_ms = max(0.0, batch_window_ms)
+        self.queue = None
+        self.stats = {"completed": 0, "rejected_busy": 0, "deadline_exceeded": 0,
+                      "failed": 0, "batches": 0, "db_failed": 0}
+        self._executors = [ThreadPoolExecutor(max_workers=1) for _ in range(self.workers)]
+        self._worker_tasks = []
+
+    # ---------- lifecycle ----------
+    async def start(self) -> None:
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        backend.get_db_connection()
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+        for i, task in enumerate(self._worker_tasks):
+            task.add_done_callback(functools.partial(_report_worker_exit, i))
+
+    async def stop(self) -> None:
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        for executor in self._executors:
+            executor.shutdown(wait=False)
+
+    # ---------- workers ----------
+    @staticmethod
+    def _load_model(index: int):
+        return backend.load_whisper_model(replica=index)
+
+    async def _worker(self, index: int) -> None:
+        """
+        Model yüklenemezse worker ölmez: kuyruktaki işler model_load_failed ile
+        cevaplanır ve sonraki batch'te yükleme yeniden denenir.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._executors[index]
+
+        async def load():
+            try:
+                return await loop.run_in_executor(executor, self._load_model, index), None
+            except Exception as e:
+                print(f"[eval_server] worker {index}: model load failed: {e!r}",
+                      file=sys.stderr)
+                return None, e
+
+        model, load_error = await load()
+        while True:
+            jobs = await self._next_batch()
+            try:
+                if model is None:
+                    model, load_error = await load()
+                if model is None:
+                    self._fail(jobs, {"error": "model_load_failed", "message": str(load_error)})
+                    continue
+                await self._run_batch(jobs, executor, model)
+            except Exception as e:
+                for job in jobs:
+                    self._fail([job], {"error": "internal_error", "command": job.command,
+                                       "message": str(e)})
+            finally:
+                for job in jobs:
+                    self.queue.task_done()
+                    if job.cleanup:
+                        _remove_quietly(job.audio_path)
+
+    def _fail(self, jobs: list, out: dict) -> None:
+        """Henüz cevaplanmamış işleri out ile bitirir ve "failed" sayacına ekler."""
+        for job in jobs:
+            if not job.future.done():
+                self.stats["failed"] += 1
+                _finish(job, out)
+
+    async def _next_batch(self) -> list:
+        """İlk işi bekler, sonra batch_window_ms boyunca gelenleri de toplar."""
+        loop = asyncio.get_running_loop()
+        jobs = [await self.queue.get()]
+        window_end = loop.time() + self.batch_window_ms / 1000.0
+        while len(jobs) < self.max_batch:
+            try:
+                jobs.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = window_end - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                jobs.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return jobs
+
+    async def _run_batch(self, jobs: list, executor, model) -> None:
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+
+        # prompt okuması SQLite'a gider: event loop yerine worker'ın executor'ında
+        prompt_ids = {job.prompt_id for job in jobs if job.command == "evaluate"}
+        prompts = {}
+        if prompt_ids:
+            prompts = await loop.run_in_executor(executor, _lookup_prompts, prompt_ids)
+
+        live = []
+        for job in jobs:
+            if job.deadline <= now:
+                self.stats["deadline_exceeded"] += 1
+                _finish(job, {"error": "deadline_exceeded", "stage": "queued"})
+                continue
+            if job.command == "evaluate":
+                job.expected = prompts.get(job.prompt_id)
+                if not job.expected:
+                    _finish(job, {"error": "prompt_not_found", "prompt_id": job.prompt_id})
+                    continue
+            live.append(job)
+        if not live:
+            return
+
+        cache = transcript_cache.get_cache() if backend.USE_TRANSCRIPT_CACHE else None
+        batch = loop.run_in_executor(executor, functools.partial(
+            whisper_batch.transcribe_batch, model, [job.audio for job in live],
+            model_name=model_registry.cache_name(backend.WHISPER_MODEL_NAME,
+                                                 backend.WHISPER_DTYPE),
+            cache=cache, return_hashes=True))
+        self.stats["batches"] += 1
+
+        # her iş kendi deadline'ı dolunca cevabını alır; batch arka planda biter
+        async def deliver(job: Job) -> None:
+            try:
+                texts, hashes = await asyncio.wait_for(asyncio.shield(batch),
+                                                       job.deadline - loop.time())
+            except asyncio.TimeoutError:
+                self.stats["deadline_exceeded"] += 1
+                _finish(job, {"error": "deadline_exceeded", "stage": "transcribe"})
+                return
+            index = live.index(job)
+            if isinstance(texts[index], Exception):
+                self.stats["failed"] += 1
+                _finish(job, {"error": "transcribe_failed", "message": str(texts[index])})
+                return
+            self._complete(job, texts[index], hashes[index])
+
+        await asyncio.gather(*(deliver(job) for job in live))
+
+    def _complete(self, job: Job, user_text: str, audio_sha256: str | None = None) -> None:
+        """Sonucu döndürür; hash transcribe_batch'te (executor'da) hesaplanmıştır."""
+        self.stats["completed"] += 1
+        if job.command == "transcribe":
+            _finish(job, {"recognized_text": user_text})
+            return
+        cmp = backend.compare_texts(job.expected, user_text)
+        saved = backend.save_recording(job.prompt_id, job.audio_path, user_text, cmp,
+                                       user_id=job.user_id, audio_sha256=audio_sha256)
+        # yazım arka planda biter; hata olursa yazar thread'inden sayaca işlenir
+        loop = asyncio.get_running_loop()
+
+        def on_saved(future) -> None:
+            if future.exception() is not None:
+                loop.call_soon_threadsafe(self._count_db_failure)
+
+        saved.add_done_callback(on_saved)
+        _finish(job, backend.build_result(job.prompt_id, job.audio_path,
+                                          job.expected, user_text, cmp))
+
+    def _count_db_failure(self) -> None:
+        self.stats["db_failed"] += 1
+
+    # ---------- requests ----------
+    def submit(self, req: dict):
+        """
+        İsteği kuyruğa koyar. Hemen cevaplanabilen durumlarda dict,
+        aksi halde sonucu taşıyan bir asyncio.Future döndürür.
+        """
+        cmd = req.get("command")
+        if cmd == "ping":
+            return {"pong": True}
+        if cmd == "stats":
+            return dict(self.stats, queued=self.queue.qsize(), queue_size=self.queue_size,
+                        workers=self.workers, max_batch=self.max_batch)
+        if cmd not in JOB_COMMANDS:
+            return {"error": "unknown_command", "command": cmd}
+
+        prompt_id = None
+        if cmd == "evaluate":
+            try:
+                prompt_id = int(req["prompt_id"])
+            except (KeyError, TypeError, ValueError):
+                return {"error": "invalid_prompt_id", "raw": req.get("prompt_id")}
+
+        if self.queue.full():
+            self.stats["rejected_busy"] += 1
+            return {"error": "busy", "queued": self.queue.qsize(), "queue_size": self.queue_size}
+
+        audio, audio_path, cleanup, err = _resolve_audio(req, save=(cmd == "evaluate"))
+        if err:
+            return err
+
+        try:
+            deadline_ms = float(req.get("deadline_ms", self.deadline_ms))
+        except (TypeError, ValueError):
+            return {"error": "invalid_deadline", "raw": req.get("deadline_ms")}
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        job = Job(cmd, prompt_id, audio, audio_path, cleanup,
+                  loop.time() + deadline_ms / 1000.0, future)
+        job.user_id = req.get("user_id")
+        self.queue.put_nowait(job)
+        return future
+
+    async def handle_client(self, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter) -> None:
+        pending = set()
+
+        def reply(obj: dict) -> None:
+            if writer.is_closing():
+                return
+            writer.write((json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8"))
+
+        async def reply_later(req_id, future: asyncio.Future) -> None:
+            out = await future
+            out["id"] = req_id
+            reply(out)
+            await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    req = json.loads(line)
+                except ValueError:
+                    reply({"id": None, "error": "invalid_json"})
+                    continue
+                if not isinstance(req, dict):
+                    reply({"id": None, "error": "invalid_request"})
+                    continue
+
+                out = self.submit(req)
+                if isinstance(out, dict):
+                    out["id"] = req.get("id")
+                    reply(out)
+                    await writer.drain()
+                else:
+                    task = asyncio.create_task(reply_later(req.get("id"), out))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+# =========================
+# helpers
+# =========================
+def _resolve_audio(req: dict, save: bool):
+    """
+    audio_path veya audio_b64 alanından Whisper girişi üretir
+    -> (audio, audio_path, cleanup, error).
+    WAV içerik bellekte çözülür; diğer formatlar ffmpeg için geçici dosyaya yazılır.
+    """
+    audio_path = req.get("audio_path")
+    if audio_path:
+        if not os.path.exists(audio_path):
+            return None, None, False, {"error": "file_not_found", "audio_path": audio_path}
+        return audio_path, audio_path, False, None
+
+    audio_b64 = req.get("audio_b64")
+    if not audio_b64:
+        return None, None, False, {"error": "missing_audio"}
+    try:
+        data = base64.b64decode(audio_b64, validate=True)
+    except (binascii.Error, ValueError):
+        return None, None, False, {"error": "invalid_audio_b64"}
+
+    if data[:4] == b"RIFF":
+        try:
+            samplerate, pcm = wavfile.read(io.BytesIO(data))
+        except ValueError as e:
+            return None, None, False, {"error": "invalid_wav", "message": str(e)}
+        audio = audio_capture.to_whisper_audio(pcm, samplerate)
+        saved_path = None
+        if save and backend.SAVE_RECORDINGS:
+            tmp = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
+            tmp.close()
+            saved_path = tmp.name
+            audio_capture.save_wav_async(saved_path, samplerate, pcm)
+        return audio, saved_path, False, None
+
+    tmp = tempfile.NamedTemporaryFile(suffix=req.get("audio_suffix", ".wav"), delete=False)
+    with tmp:
+        tmp.write(data)
+    return tmp.name, tmp.name, not save, None
+
+
+def _finish(job: Job, out: dict) -> None:
+    if not job.future.done():
+        job.future.set_result(out)
+
+
+def _lookup_prompts(prompt_ids: set) -> dict:
+    """{prompt_id: expected_text}; executor thread'inde çalışır (thread'e ait bağlantı)."""
+    return {pid: backend.get_prompt_by_id(pid) for pid in prompt_ids}
+
+
+def _report_worker_exit(index: int, task: asyncio.Task) -> None:
+    """Worker beklenmedik şekilde biterse (stop() hariç) stderr'e yazar."""
+    if task.cancelled():
+        return
+    error = task.exception()
+    print(f"[eval_server] worker {index} exited: {error!r}", file=sys.stderr)
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+async def run_server(args) -> None:
+    server = EvaluationServer(workers=args.workers,
+                              queue_size=args.queue_size,
+                              deadline_ms=args.deadline_ms,
+                              max_batch=args.max_batch,
+                              batch_window_ms=args.batch_window_ms)
+    await server.start()
+    if args.unix:
+        listener = await asyncio.start_unix_server(server.handle_client, path=args.unix)
+        where = args.unix
+    else:
+        listener = await asyncio.start_server(server.handle_client, args.host, args.port)
+        where = f"{args.host}:{args.port}"
+
+    print(f"[eval_server] listening on {where} "
+          f"(workers={server.workers}, queue={server.queue_size}, "
+          f"max_batch={server.max_batch})", file=sys.stderr)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await server.stop()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="ClearComs classroom evaluation server")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="listen on a Unix socket path instead of TCP")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="number of inference workers (each holds one model)")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                        help="max queued jobs before requests are rejected as busy")
+    parser.add_argument("--deadline-ms", type=int, default=DEFAULT_DEADLINE_MS,
+                        help="default per-request deadline")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH,
+                        help="max recordings decoded together in one Whisper pass")
+    parser.add_argument("--batch-window-ms", type=float, default=DEFAULT_BATCH_WINDOW_MS,
+                        help="how long a worker waits to fill a batch")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(run_server(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,161 @@
+"""
+Çözülmüş ses / log-mel cache'i.
+
+Whisper her .m4a/.mp3 için ffmpeg'i çalıştırıp 16 kHz'e çevirir ve
+log-mel'i baştan hesaplar; aynı dosya başka bir model boyutuyla tekrar
+denendiğinde de. Burada bir dosya bir kez çözülür ve dosya içeriğinin
+sha256'sı ile feature_cache/ klasörüne .npy olarak yazılır:
+
+    <hash>.pcm16k.npy    16 kHz float32 PCM (tam uzunluk)
+    <hash>.mel<N>.npy    30 sn'ye pad'lenmiş N-bin log-mel (whisper_batch girişi)
+
+Okuma np.load(mmap_mode="r") ile yapılır, yani ffmpeg ve FFT hiç çalışmaz.
+Klasör MAX_BYTES'ı aşınca en uzun süredir kullanılmayan dosyalar silinir.
+
+Test korpusunu önceden çözmek için:
+    python feature_cache.py "test/*.mp3" --mel 80
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+import threading
+
+import numpy as np
+
+from transcript_cache import audio_sha256
+
+
+ENABLED = os.environ.get("CLEARCOMS_FEATURE_CACHE", "1") != "0"
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "feature_cache")
+MAX_BYTES = int(os.environ.get("CLEARCOMS_FEATURE_CACHE_MB", "2048")) * 1024 * 1024
+
+_prune_lock = threading.Lock()
+
+
+def _path(audio_hash: str, kind: str) -> str:
+    return os.path.join(CACHE_DIR, f"{audio_hash}.{kind}.npy")
+
+
+def _load(path: str) -> np.ndarray | None:
+    try:
+        array = np.load(path, mmap_mode="r")
+    except (FileNotFoundError, ValueError):
+        return None
+    try:
+        os.utime(path)      # LRU için son kullanım zamanı
+    except OSError:
+        pass
+    return array
+
+
+def _save(path: str, array: np.ndarray) -> None:
+    """Yarım yazılmış dosya cache'e girmesin: önce geçici dosya, sonra rename."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix=".npy", dir=CACHE_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _prune()
+
+
+def _prune() -> None:
+    with _prune_lock:
+        try:
+            entries = [e for e in os.scandir(CACHE_DIR) if e.name.endswith(".npy")]
+        except FileNotFoundError:
+            return
+        stats = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in entries]
+        total = sum(size for _, size, _ in stats)
+        for _, size, path in sorted(stats):
+            if total <= MAX_BYTES:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+def load_pcm(path: str, audio_hash: str | None = None, writable: bool = False) -> np.ndarray:
+    """
+    Dosyayı 16 kHz float32 mono olarak döndürür (salt okunur, memory-mapped).
+    Cache'te yoksa whisper.load_audio (ffmpeg) ile bir kez çözülür.
+    writable=True bellekte bir kopya verir (torch.from_numpy salt okunur
+    dizide uyarı verir; model.transcribe'a verilecekse bunu kullanın).
+    """
+    if not ENABLED:
+        import whisper
+        return whisper.load_audio(path)
+
+    audio_hash = audio_hash or audio_sha256(path)
+    cache_path = _path(audio_hash, "pcm16k")
+    pcm = _load(cache_path)
+    if pcm is None:
+        import whisper
+        decoded = whisper.load_audio(path)
+        _save(cache_path, decoded)
+        # başka bir process'in _prune'u dosyayı hemen silmiş olabilir
+        pcm = _load(cache_path)
+        if pcm is None:
+            pcm = decoded
+    return np.array(pcm) if writable else pcm
+
+
+def load_mel(path: str, n_mels: int = 80, audio_hash: str | None = None) -> np.ndarray:
+    """30 sn'ye pad'lenmiş (n_mels, 3000) log-mel; memory-mapped."""
+    import whisper
+
+    if not ENABLED:
+        audio = whisper.load_audio(path)
+        return whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=n_mels).numpy()
+
+    audio_hash = audio_hash or audio_sha256(path)
+    cache_path = _path(audio_hash, f"mel{n_mels}")
+    mel = _load(cache_path)
+    if mel is None:
+        audio = np.array(load_pcm(path, audio_hash))
+        computed = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=n_mels).numpy()
+        _save(cache_path, computed)
+        mel = _load(cache_path)
+        if mel is None:
+            mel = computed
+    return mel
+
+
+def predecode(paths: list, mels: tuple = ()) -> dict:
+    """Ön-çözme aşaması: her dosya için PCM (ve istenen mel boyutları) üretir."""
+    done, failed = 0, []
+    for path in paths:
+        try:
+            audio_hash = audio_sha256(path)
+            load_pcm(path, audio_hash)
+            for n_mels in mels:
+                load_mel(path, n_mels, audio_hash)
+            done += 1
+        except Exception as e:
+            failed.append({"file": path, "error": str(e)})
+    return {"files": len(paths), "decoded": done, "failed": failed}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Pre-decode audio files into the feature cache")
+    parser.add_argument("patterns", nargs="+", help='audio files or globs, e.g. "test/*.mp3"')
+    parser.add_argument("--mel", type=int, action="append", default=[],
+                        help="also store N-bin log-mels (80; 128 for large-v3)")
+    args = parser.parse_args(argv)
+
+    paths = sorted({p for pattern in args.patterns for p in glob.glob(pattern)})
+    summary = predecode(paths, tuple(args.mel))
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
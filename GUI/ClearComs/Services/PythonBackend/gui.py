@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import sqlite3
 import tkinter as tk
 from tkinter import ttk, messagebox
 import threading
@@ -10,6 +9,8 @@ import os
 import numpy as np
 import time
 
+import db
+
 # --- Optional deps (handle missing gracefully) ---
 try:
     import pyttsx3
@@ -19,9 +20,16 @@ except Exception as e:
 try:
     import sounddevice as sd
     from scipy.io.wavfile import write as wav_write
+    import audio_capture
 except Exception as e:
     sd = None
     wav_write = None
+    audio_capture = None
+
+try:
+    import tts_cache
+except Exception as e:
+    tts_cache = None
 
 # Fuzzy for metrics + fallback compare
 try:
@@ -35,6 +43,12 @@ try:
 except Exception as e:
     stt_speech = None
 
+try:
+    import model_registry
+    from Active_STT import STT_MODEL_NAME
+except Exception as e:
+    model_registry = None
+
 # Try to import user's compare function
 user_compare = None
 try:
@@ -49,7 +63,8 @@ except Exception as e:
 DB_PATH = "speech_eval_small.db"
 DEFAULT_TTS_VOICE = "com.apple.speech.synthesis.voice.Alex"  # macOS
 DEFAULT_TTS_RATE = 150  # slower for clarity
-RECORD_SECONDS = 5       # fixed-duration recording
+RECORD_SECONDS = 5       # fixed-duration recording (used when VAD is off)
+USE_VAD = True           # stop recording after trailing silence
 FUZZY_PASS_THRESHOLD = 85  # used if user's compare() doesn't return a pass flag
 
 
@@ -57,31 +72,33 @@ FUZZY_PASS_THRESHOLD = 85  # used if user's compare() doesn't return a pass flag
 # Database helpers
 # -----------------------------
 def load_prompts():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    c = db.get_connection(DB_PATH).cursor()
     c.execute("SELECT id, expected_text FROM prompts ORDER BY id ASC")
     rows = c.fetchall()
-    conn.close()
     return rows  # list[(id, text)]
 
 
 def save_recording(prompt_id, file_path, recognized_text, score=None,
                    ratio=None, partial=None, token_sort=None, passed=None, feedback=None):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('''
-        INSERT INTO recordings (
-            prompt_id, file_path, recognized_text, score, ratio, partial, token_sort, passed, feedback
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (prompt_id, file_path, recognized_text, score, ratio, partial, token_sort, passed, feedback))
-    conn.commit()
-    conn.close()
+    # worker thread'leri doğrudan yazmaz; tek yazar kuyruğu toplu commit eder
+    return db.insert_recording(DB_PATH, dict(
+        prompt_id=prompt_id, file_path=file_path, recognized_text=recognized_text,
+        score=score, ratio=ratio, partial=partial, token_sort=token_sort,
+        passed=passed, feedback=feedback,
+    ))
 
 
 # -----------------------------
 # Speech helpers
 # -----------------------------
 def speak_text_mac(text, rate=DEFAULT_TTS_RATE, voice=DEFAULT_TTS_VOICE):
+    # pre-rendered audio first (tts_cache), live synthesis only as fallback
+    if tts_cache is not None:
+        try:
+            tts_cache.speak_cached(text, voice, rate)
+            return
+        except Exception:
+            pass
     if pyttsx3 is None:
         raise RuntimeError("pyttsx3 not installed. Try: pip install pyttsx3")
     engine = pyttsx3.init(driverName='nsss')
@@ -98,7 +115,7 @@ def speak_text_mac(text, rate=DEFAULT_TTS_RATE, voice=DEFAULT_TTS_VOICE):
     engine.runAndWait()
 
 
-def record_audio(duration=5, samplerate=44100):
+def record_audio(duration=5, samplerate=44100, vad=False):
     # Eğer kullanıcıya uygun input yoksa default device seçilir
     try:
         devices = sd.query_devices()
@@ -114,8 +131,11 @@ def record_audio(duration=5, samplerate=44100):
     sd.default.device = (default_input, default_output)
 
     print("Recording with device:", sd.default.device)
-    data = sd.rec(int(duration * samplerate), samplerate=samplerate, channels=1, dtype='int16')
-    sd.wait()
+    if vad:
+        data = audio_capture.record_until_silence(samplerate=samplerate)
+    else:
+        data = sd.rec(int(duration * samplerate), samplerate=samplerate, channels=1, dtype='int16')
+        sd.wait()
 
     tmp = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
     wav_write(tmp.name, samplerate, data)
@@ -252,6 +272,10 @@ class FlashcardApp:
 
         self.show_card()
 
+        # Whisper'ı arka planda yükle, ilk "Record" modeli beklemesin
+        if model_registry is not None and stt_speech is not None:
+            model_registry.preload(STT_MODEL_NAME)
+
     # Navigation
     def show_card(self):
         pid, text = self.prompts[self.index]
@@ -292,8 +316,11 @@ class FlashcardApp:
 
         def _run():
             try:
-                self._set_busy(True, f"Recording ({RECORD_SECONDS} sn)...")
-                audio_path = record_audio(RECORD_SECONDS)
+                if USE_VAD:
+                    self._set_busy(True, "Recording... (stops when you finish speaking)")
+                else:
+                    self._set_busy(True, f"Recording ({RECORD_SECONDS} sn)...")
+                audio_path = record_audio(RECORD_SECONDS, vad=USE_VAD)
                 self._set_busy(True, "running STT...")
                 recognized = stt_speech(audio_path,pid)
                 if not isinstance(recognized, str):
@@ -306,7 +333,7 @@ class FlashcardApp:
                 self._set_busy(True, "Comparing...")
                 cmp_res = run_compare(expected, recognized)
 
-                # Save into DB
+                # Save into DB (commit'i bekle: yazılamazsa hata kutusu çıksın)
                 save_recording(
                     prompt_id=pid,
                     file_path=audio_path,
@@ -317,7 +344,7 @@ class FlashcardApp:
                     token_sort=cmp_res.get("token_sort"),
                     passed=cmp_res.get("passed"),
                     feedback=cmp_res.get("feedback"),
-                )
+                ).result()
 
                 # Update UI
                 verdict = cmp_res.get("passed")
@@ -0,0 +1,190 @@
+"""
+Process genelinde paylaşılan Whisper model kayıt defteri.
+
+Her (model adı, device, dtype, replica) bir kez yüklenir; Active_STT, STT.py,
+communications_backend ve eval_server aynı nesneyi kullanır. Yüklü modellerin
+toplam boyutu MAX_MODEL_BYTES'ı aşınca en uzun süredir kullanılmayan model
+bırakılır (LRU). preload() modeli arka planda yükler, ilk tıklama beklemez.
+
+    model = model_registry.get_model("small")
+    model = model_registry.get_model("small", dtype="int8")   # CPU, int8 Linear katmanları
+
+dtype="int8": Linear katmanlarının ağırlıkları int8'e dinamik olarak
+kuantize edilir (aktivasyonlar çalışırken ölçeklenir). Sadece CPU'da
+çalışır; doğruluk/hız karşılaştırması için: python benchmark.py --only quant
+"""
+import os
+import threading
+from collections import OrderedDict
+
+
+MAX_MODEL_BYTES = int(os.environ.get("CLEARCOMS_MODEL_MEMORY_MB", "4096")) * 1024 * 1024
+
+_lock = threading.Lock()
+_models = OrderedDict()     # key -> model, en son kullanılan sonda
+_sizes = {}
+_loading = {}               # key -> threading.Event (aynı model iki kez yüklenmesin)
+DTYPES = ("fp32", "fp16", "int8")
+
+
+def _default_device() -> str:
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def model_bytes(model) -> int:
+    """
+    Parametre + buffer boyutu (yaklaşık bellek kullanımı).
+    Kuantize Linear'ların paketlenmiş ağırlıkları parameters()'ta görünmez,
+    o yüzden state_dict üzerinden sayılır.
+    """
+    import torch
+
+    def size(value) -> int:
+        if isinstance(value, torch.Tensor):
+            return value.numel() * value.element_size()
+        if isinstance(value, (tuple, list)):
+            return sum(size(v) for v in value)
+        return 0
+
+    return sum(size(v) for v in model.state_dict().values())
+
+
+def cache_name(name: str, dtype: str = "fp32") -> str:
+    """transcript_cache anahtarı: kuantize model çıktısı fp32'ninkiyle karışmasın."""
+    return name if dtype == "fp32" else f"{name}.{dtype}"
+
+
+def _plain_linears(module) -> None:
+    """
+    whisper.model.Linear (nn.Linear alt sınıfı) -> nn.Linear.
+    quantize_dynamic sadece tam olarak nn.Linear tipindeki katmanları değiştirir;
+    fp32'de ikisinin forward'u aynıdır.
+    """
+    import torch.nn as nn
+
+    for child_name, child in module.named_children():
+        if isinstance(child, nn.Linear) and type(child) is not nn.Linear:
+            linear = nn.Linear(child.in_features, child.out_features,
+                               bias=child.bias is not None)
+            linear.weight = child.weight
+            linear.bias = child.bias
+            setattr(module, child_name, linear)
+        else:
+            _plain_linears(child)
+
+
+def quantize_int8(model):
+    """Linear katmanlarına int8 dinamik kuantizasyon (CPU)."""
+    import torch
+    import torch.nn as nn
+
+    _plain_linears(model)
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def _load(name: str, device: str, dtype: str):
+    import whisper
+
+    if dtype not in DTYPES:
+        raise ValueError(f"unknown model dtype: {dtype}")
+    if dtype == "int8" and device != "cpu":
+        raise ValueError("int8 (dynamic quantization) models run on cpu only")
+    model = whisper.load_model(name, device=device)
+    if dtype == "fp16":
+        model = model.half()
+    elif dtype == "int8":
+        model = quantize_int8(model)
+    model.eval()
+    return model
+
+
+def _resolve_device(device: str | None, dtype: str) -> str:
+    return device or ("cpu" if dtype == "int8" else _default_device())
+
+
+def load_model(name: str, device: str | None = None, dtype: str = "fp32"):
+    """
+    Registry'ye girmeyen, yeni yüklenmiş bir model kopyası (cache'i
+    paylaşmaz, LRU'ya sayılmaz). Yükleme süresini ölçen ve modeli iş
+    bitince bırakan benchmark'lar için; uygulama kodu get_model kullanır.
+    """
+    return _load(name, _resolve_device(device, dtype), dtype)
+
+
+def _evict_locked(keep) -> None:
+    """Toplam boyut sınırın altına inene kadar LRU modelleri bırakır (keep hariç)."""
+    while sum(_sizes.values()) > MAX_MODEL_BYTES:
+        victim = next((k for k in _models if k != keep), None)
+        if victim is None:
+            break
+        del _models[victim]
+        del _sizes[victim]
+    try:
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except Exception:
+        pass
+
+
+def get_model(name: str, device: str | None = None, dtype: str = "fp32", replica: int = 0):
+    """
+    Modeli (gerekirse yükleyip) döndürür.
+    replica > 0, aynı modelin ayrı bir kopyasını verir; aynı model nesnesini
+    paralel thread'lerde kullanmak güvenli olmadığı için eval_server worker'ları için.
+    """
+    device = _resolve_device(device, dtype)
+    key = (name, device, dtype, replica)
+
+    while True:
+        with _lock:
+            if key in _models:
+                _models.move_to_end(key)
+                return _models[key]
+            event = _loading.get(key)
+            if event is None:
+                event = threading.Event()
+                _loading[key] = event
+                break
+        # başka bir thread yüklüyor, bitmesini bekle
+        event.wait()
+
+    try:
+        model = _load(name, device, dtype)
+        with _lock:
+            _models[key] = model
+            _sizes[key] = model_bytes(model)
+            _evict_locked(keep=key)
+        return model
+    finally:
+        with _lock:
+            _loading.pop(key, None)
+        event.set()
+
+
+def preload(name: str, device: str | None = None, dtype: str = "fp32") -> threading.Thread:
+    """Modeli arka plan thread'inde yükler (hata olursa ilk get_model tekrar dener)."""
+    def run():
+        try:
+            get_model(name, device=device, dtype=dtype)
+        except Exception:
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def unload(name: str | None = None) -> None:
+    """Verilen modelin (ya da hepsinin) tüm kopyalarını bırakır."""
+    with _lock:
+        for key in [k for k in _models if name is None or k[0] == name]:
+            del _models[key]
+            del _sizes[key]
+
+
+def loaded_models() -> list:
+    with _lock:
+        return [{"name": k[0], "device": k[1], "dtype": k[2], "replica": k[3],
+                 "bytes": _sizes[k]} for k in _models]
@@ -0,0 +1,179 @@
+"""
+Beklenen metni puanlama (teacher-forced "verify" modu).
+
+Değerlendirmede hedef cümle zaten belli (prompts.expected_text). Serbest
+decode (token token, temperature fallback'li) yerine hedef metin
+token'lara çevrilir ve decoder ses üzerinde tek bir forward pass'le
+çalıştırılır: her token'ın log-olasılığı, kelime bazında "söylendi /
+kaçırıldı" ve geçti/kaldı kararı çıkar.
+
+    result = prompt_scoring.verify(model, audio, "Turn left heading 090.")
+    result["score"], result["passed"], result["missed"]   # 75, False, ["090"]
+
+Skor (0-100) hedefteki kelimelerin kaçının WORD_MIN_LOGPROB'un üstünde
+olduğudur; compare_texts'in skoruyla aynı PASS_THRESHOLD ile kullanılır.
+
+Kapalı küme tanıma (drill modu, kursiyer herhangi bir prompt'u söyleyebilir):
+ses bir kez encode edilir, tüm aday prompt'lar batch'ler halinde aynı
+encoder çıktısı üzerinde puanlanır ve en olası top_k döner.
+
+    prompt_scoring.rank_prompts(model, audio, {1: "Climb and ...", 2: ...}, top_k=3)
+"""
+import math
+
+import torch
+from whisper.tokenizer import get_tokenizer
+
+import timings
+import whisper_batch
+
+
+WORD_MIN_LOGPROB = -1.5     # kelime token'larının ortalaması bunun altındaysa "kaçırıldı"
+NO_SPEECH_MAX = 0.6         # no_speech olasılığı bunun üstündeyse kayıt sessiz sayılır
+PASS_THRESHOLD = 80
+RANK_BATCH_SIZE = 16        # rank_prompts: decoder'a aynı anda giren aday sayısı (logits ~ batch x token x 51865)
+
+
+def tokenizer_for(model, language: str = "en"):
+    return get_tokenizer(model.is_multilingual, num_languages=model.num_languages,
+                         language=language, task="transcribe")
+
+
+def _is_word(text: str) -> bool:
+    # "." gibi tek başına noktalama token'ları kelime sayılmaz
+    return any(c.isalnum() for c in text)
+
+
+def score_tokens(model, features: torch.Tensor, tokenizer, text_tokens: list) -> tuple:
+    """
+    Decoder'ı <sot ...> + text_tokens + <eot> üzerinde bir kez çalıştırır.
+    -> (text_tokens + eot için log-olasılıklar, no_speech olasılığı)
+    """
+    sot = list(tokenizer.sot_sequence_including_notimestamps)
+    tokens = torch.tensor([sot + text_tokens + [tokenizer.eot]], device=features.device)
+    with torch.no_grad():
+        logits = model.logits(tokens[:, :-1], features).float()
+    logprobs = logits[0].log_softmax(dim=-1)
+    no_speech = logprobs[sot.index(tokenizer.sot), tokenizer.no_speech].exp().item()
+    # i. pozisyonun çıktısı (i+1). token'ı tahmin eder
+    targets = tokens[0, len(sot):]
+    picked = logprobs[len(sot) - 1:].gather(1, targets[:, None])[:, 0]
+    return picked.tolist(), no_speech
+
+
+def verify(model, audio, expected: str, language: str = "en", audio_hash: str | None = None,
+           pass_threshold: int = PASS_THRESHOLD) -> dict:
+    """
+    audio: dosya yolu ya da 16 kHz float32 dizi (30 sn'ye pad'lenir).
+    Dönen dict: score, passed, avg_logprob, no_speech_prob, words
+    ([{"word", "logprob", "matched"}]), missed, token_logprobs (son eleman <eot>).
+    """
+    tokenizer = tokenizer_for(model, language)
+    text_tokens = tokenizer.encode(" " + expected.strip())
+
+    with timings.stage("whisper_encoder"):
+        features = whisper_batch.audio_features(model, audio, audio_hash)
+    with timings.stage("whisper_verify"):
+        token_logprobs, no_speech = score_tokens(model, features, tokenizer, text_tokens)
+
+    words, word_tokens = tokenizer.split_to_word_tokens(text_tokens)
+    out_words, pos = [], 0
+    for word, toks in zip(words, word_tokens):
+        logprob = sum(token_logprobs[pos:pos + len(toks)]) / len(toks)
+        pos += len(toks)
+        if _is_word(word):
+            out_words.append({"word": word.strip(), "logprob": round(logprob, 3),
+                              "matched": logprob >= WORD_MIN_LOGPROB})
+
+    matched = sum(w["matched"] for w in out_words)
+    score = int(100 * matched / len(out_words)) if out_words else 0
+    return {
+        "text": expected,
+        "score": score,
+        "passed": score >= pass_threshold and no_speech < NO_SPEECH_MAX,
+        "avg_logprob": round(sum(token_logprobs) / len(token_logprobs), 3),
+        "no_speech_prob": round(no_speech, 3),
+        "words": out_words,
+        "missed": [w["word"] for w in out_words if not w["matched"]],
+        "token_logprobs": [round(lp, 3) for lp in token_logprobs],
+    }
+
+
+# =========================
+# closed-set recognition
+# =========================
+def _batched_logits(model, tokens: torch.Tensor, features: torch.Tensor,
+                    first: int = 0) -> torch.Tensor:
+    """
+    model.logits(tokens, features)[:, first:] ile aynı, ama features (1, ctx, state)
+    tüm batch için tek: cross-attention key/value'ları bir kez hesaplanıp her
+    satır için (kopyasız expand ile) tekrar kullanılır. Kelime dağarcığına
+    izdüşüm sadece first'ten sonraki pozisyonlar için yapılır.
+    """
+    decoder = model.decoder
+    batch = tokens.shape[0]
+    cross = {}
+    for block in decoder.blocks:
+        attn = block.cross_attn
+        cross[attn.key] = attn.key(features).expand(batch, -1, -1)
+        cross[attn.value] = attn.value(features).expand(batch, -1, -1)
+    xa = features.expand(batch, -1, -1)
+
+    # TextDecoder.forward kv_cache'ten pozisyon offset'i çıkarır; burada
+    # cache sadece cross-attention içerdiği için bloklar doğrudan çağrılır
+    x = decoder.token_embedding(tokens) + decoder.positional_embedding[:tokens.shape[-1]]
+    x = x.to(features.dtype)
+    for block in decoder.blocks:
+        x = block(x, xa, mask=decoder.mask, kv_cache=cross)
+    x = decoder.ln(x[:, first:])
+    return (x @ decoder.token_embedding.weight.to(x.dtype).T).float()
+
+
+def rank_prompts(model, audio, candidates: dict, top_k: int = 5, language: str = "en",
+                 audio_hash: str | None = None, batch_size: int = RANK_BATCH_SIZE) -> list:
+    """
+    candidates: {prompt_id: metin}. Her aday için log P(metin + <eot> | ses)
+    hesaplanır; en yüksek top_k aday
+    [{"prompt_id", "text", "logprob", "avg_logprob", "probability"}, ...]
+    olarak döner. probability, adaylar arasında normalize edilmiş
+    (softmax) olasılıktır; logprob toplam olduğu için <eot> dahil kısa bir
+    önek tam cümleyi geçemez.
+    """
+    if not candidates:
+        return []
+    tokenizer = tokenizer_for(model, language)
+    sot = list(tokenizer.sot_sequence_including_notimestamps)
+    ids = list(candidates)
+    seqs = [sot + tokenizer.encode(" " + candidates[i].strip()) + [tokenizer.eot] for i in ids]
+
+    with timings.stage("whisper_encoder"):
+        features = whisper_batch.audio_features(model, audio, audio_hash)
+
+    totals, lengths = [], []
+    with timings.stage("whisper_rank"), torch.no_grad():
+        for start in range(0, len(seqs), batch_size):
+            chunk = seqs[start:start + batch_size]
+            width = max(len(seq) for seq in chunk)
+            tokens = torch.tensor([seq + [tokenizer.eot] * (width - len(seq)) for seq in chunk],
+                                  device=features.device)
+            # sot dizisinin kendi token'ları puanlanmaz: son sot pozisyonundan itibaren
+            logits = _batched_logits(model, tokens[:, :-1], features, first=len(sot) - 1)
+            picked = (logits.gather(2, tokens[:, len(sot):, None])[..., 0]
+                      - logits.logsumexp(dim=-1))
+            # padding puana girmez
+            positions = torch.arange(picked.shape[1], device=features.device)[None, :]
+            n_text = torch.tensor([len(seq) - len(sot) for seq in chunk],
+                                  device=features.device)[:, None]
+            mask = positions < n_text
+            totals += (picked * mask).sum(dim=1).tolist()
+            lengths += n_text[:, 0].tolist()
+
+    best = max(totals)
+    norm = best + math.log(sum(math.exp(t - best) for t in totals))
+    order = sorted(range(len(ids)), key=lambda i: totals[i], reverse=True)[:top_k]
+    return [{"prompt_id": ids[i],
+             "text": candidates[ids[i]],
+             "logprob": round(totals[i], 3),
+             "avg_logprob": round(totals[i] / lengths[i], 3),
+             "probability": round(math.exp(totals[i] - norm), 4)}
+            for i in order]
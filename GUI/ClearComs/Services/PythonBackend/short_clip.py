@@ -0,0 +1,111 @@
+"""
+Kısa kayıtlar için küçültülmüş encoder penceresi.
+
+Whisper her kaydı 30 saniyelik pencereye pad'ler; 5 saniyelik bir
+record_and_evaluate kaydı encoder'da gerekenin ~6 katı iş yapar. Bu modda
+ses, süresini karşılayan en küçük sabit kovaya (BUCKET_SECONDS) pad'lenir
+ve encoder pozisyon embedding'inin sadece ilk kısmıyla o uzunlukta
+çalışır. Kovalar sabit olduğu için tensör şekilleri birkaç taneyle sınırlı
+kalır. Decoder değişmez; cross-attention kısa encoder çıktısına bakar.
+
+    model = short_clip.ShortClipModel(whisper_model)
+    model.transcribe(audio, language="en")["text"]
+
+Whisper 30 sn pencerelerle eğitildiği için doğruluk biraz değişebilir;
+korpus üzerinde karşılaştırma için: python benchmark.py --only short
+30 saniyeden uzun kayıtlar normal model.transcribe() yoluna düşer.
+"""
+import copy
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+import whisper
+from whisper.audio import HOP_LENGTH, SAMPLE_RATE
+
+import whisper_batch
+
+
+BUCKET_SECONDS = (5, 10, 15, 20, 30)
+
+
+def bucket_for(n_samples: int, buckets=BUCKET_SECONDS) -> int:
+    """Kaydı karşılayan en küçük kova (sn); hiçbiri yetmezse 0."""
+    return next((b for b in sorted(buckets) if n_samples <= b * SAMPLE_RATE), 0)
+
+
+class BucketEncoder(torch.nn.Module):
+    """AudioEncoder ile aynı ağırlıklar; pozisyon embedding'i girişin uzunluğuna kesilir."""
+
+    def __init__(self, encoder):
+        super().__init__()
+        self.encoder = encoder
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        enc = self.encoder
+        x = F.gelu(enc.conv1(x))
+        x = F.gelu(enc.conv2(x))
+        x = x.permute(0, 2, 1)
+        x = (x + enc.positional_embedding[:x.shape[1]]).to(x.dtype)
+        for block in enc.blocks:
+            x = block(x)
+        return enc.ln_post(x)
+
+
+def _bucket_view(model):
+    """Ağırlıkları paylaşan, encoder'ı BucketEncoder olan sığ kopya (whisper.decode için)."""
+    view = copy.copy(model)
+    view._modules = dict(model._modules)
+    view._modules["encoder"] = BucketEncoder(model.encoder)
+    return view
+
+
+class ShortClipModel:
+    """
+    Whisper modelini saran, transcribe() arayüzü aynı nesne; transcript_cache
+    ve timings.transcribe ile normal model gibi kullanılır. Kısa kayıtlar
+    tek pencerede, temperature fallback'siz greedy decode edilir.
+    """
+
+    def __init__(self, model, buckets=BUCKET_SECONDS):
+        self.model = model
+        self.buckets = tuple(buckets)
+        self.view = _bucket_view(model)
+        # timings.transcribe encoder süresini bu modülün hook'larıyla ölçer
+        self.encoder = self.view.encoder
+
+    @property
+    def device(self):
+        return self.model.device
+
+    def transcribe(self, audio, language: str = "en", **options) -> dict:
+        array = whisper_batch.load_audio_array(audio)
+        bucket = bucket_for(len(array), self.buckets)
+        if not bucket:
+            return self.model.transcribe(np.array(array), language=language, **options)
+
+        n_samples = bucket * SAMPLE_RATE
+        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(array, n_samples),
+                                          n_mels=self.model.dims.n_mels)
+        assert mel.shape[-1] == n_samples // HOP_LENGTH
+        result = whisper.decode(self.view, mel.to(self.model.device),
+                                whisper_batch.decoding_options(self.model, language))
+        return {
+            "text": result.text,
+            "language": result.language,
+            "segments": [{
+                "id": 0, "start": 0.0, "end": len(array) / SAMPLE_RATE,
+                "text": result.text, "tokens": result.tokens,
+                "temperature": result.temperature, "avg_logprob": result.avg_logprob,
+                "compression_ratio": result.compression_ratio,
+                "no_speech_prob": result.no_speech_prob,
+            }],
+            "bucket_seconds": bucket,
+        }
+
+
+def wrap(model, buckets=BUCKET_SECONDS):
+    """Model ya da modeli döndüren fonksiyon (transcript_cache tembel yükleme) alır."""
+    if hasattr(model, "transcribe"):
+        return ShortClipModel(model, buckets)
+    return lambda: ShortClipModel(model(), buckets)
@@ -0,0 +1,258 @@
+"""
+Speculative decoding: küçük taslak model + büyük doğrulayıcı model.
+
+Büyük model (ör. "large") CPU'da her token için decoder'ın tamamını
+çalıştırır; kısa telsiz cümlelerinde süre çoğunlukla buradadır. Bu modda
+küçük model ("tiny"/"base") sıradaki DRAFT_TOKENS token'ı greedy önerir,
+büyük model hepsini tek forward pass'te doğrular. Büyük modelin kendi
+greedy seçimiyle uyuşan önek kabul edilir, ilk uyuşmayan yerde büyük
+modelin token'ı alınır. Sonuç büyük modelin greedy transkriptiyle
+aynıdır (aynı logit filtreleri, temperature fallback yok); sadece büyük
+modelin decoder çağrı sayısı azalır.
+
+    model = speculative.SpeculativeModel(get_model("large"), get_model("base"))
+    model.transcribe(audio, language="en")["text"]
+
+Karşılaştırma (düz greedy vs speculative, süre ve birebir eşitlik):
+    python speculative.py test/rec1.mp3 --target large --draft base
+
+İki modelin metin token'ları aynı olmalı (ikisi de çok dilli ya da ikisi de
+".en"). 30 saniyeden uzun kayıtlar büyük modelin transcribe() yoluna düşer.
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+import whisper
+from whisper.audio import N_SAMPLES
+from whisper.decoding import DecodingOptions, DecodingTask
+
+
+DRAFT_TOKENS = 4            # taslak modelin tur başına önerdiği token sayısı
+
+
+def _attend(attn, q: torch.Tensor, k: torch.Tensor, v: torch.Tensor,
+            mask: torch.Tensor | None) -> torch.Tensor:
+    def heads(t):
+        return t.view(*t.shape[:2], attn.n_head, -1).permute(0, 2, 1, 3)
+
+    # whisper'ın q ve k'yı ayrı ayrı d^-0.25 ile ölçeklemesi, SDPA'nın d^-0.5'i ile aynı
+    out = F.scaled_dot_product_attention(heads(q), heads(k), heads(v), attn_mask=mask)
+    return attn.out(out.permute(0, 2, 1, 3).flatten(start_dim=2))
+
+
+class IncrementalDecoder:
+    """
+    Bir modelin kv-cache'li decoder durumu. whisper'ın kendi kv-cache
+    hook'ları cache dolu iken birden fazla token'ı (doğrulama için) aynı
+    anda besleyemediğinden self-attention cache'i burada tutulur; geri
+    sarmak (reddedilen taslak token'lar) cache'i kesmekten ibarettir.
+    """
+
+    def __init__(self, model, audio: np.ndarray, language: str):
+        self.model = model
+        self.task = DecodingTask(model, DecodingOptions(
+            language=language, without_timestamps=True, fp16=model.device.type != "cpu"))
+        self.tokenizer = self.task.tokenizer
+        dtype = next(model.encoder.parameters()).dtype
+        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=model.dims.n_mels)
+        with torch.no_grad():
+            features = model.embed_audio(mel[None].to(model.device, dtype))
+            self.cross = [(b.cross_attn.key(features), b.cross_attn.value(features))
+                          for b in model.decoder.blocks]
+        self.dtype = features.dtype
+        self.keys = [None] * len(model.decoder.blocks)
+        self.values = [None] * len(model.decoder.blocks)
+        self.fed = []                   # cache'teki token'lar
+
+    def feed(self, tokens: list) -> torch.Tensor:
+        """tokens'ı cache'in sonuna ekler; her biri için sonraki token logit'leri (n, vocab)."""
+        dec = self.model.decoder
+        offset, n = len(self.fed), len(tokens)
+        ids = torch.tensor([tokens], device=self.model.device)
+        # i. yeni token, cache'teki her şeyi ve kendinden öncekileri görür
+        mask = torch.ones(n, offset + n, dtype=torch.bool, device=ids.device).tril(offset)
+        with torch.no_grad():
+            x = (dec.token_embedding(ids) + dec.positional_embedding[offset:offset + n]).to(self.dtype)
+            for i, block in enumerate(dec.blocks):
+                h = block.attn_ln(x)
+                k, v = block.attn.key(h), block.attn.value(h)
+                if self.keys[i] is not None:
+                    k = torch.cat([self.keys[i], k], dim=1)
+                    v = torch.cat([self.values[i], v], dim=1)
+                self.keys[i], self.values[i] = k, v
+                x = x + _attend(block.attn, block.attn.query(h), k, v, mask)
+                h = block.cross_attn_ln(x)
+                x = x + _attend(block.cross_attn, block.cross_attn.query(h), *self.cross[i], None)
+                x = x + block.mlp(block.mlp_ln(x))
+            x = dec.ln(x)
+            logits = (x @ dec.token_embedding.weight.to(x.dtype).T).float()
+        self.fed += tokens
+        return logits[0]
+
+    def rollback(self, n: int) -> None:
+        """Cache'te sadece ilk n token kalsın."""
+        if n < len(self.fed):
+            self.keys = [k[:, :n] for k in self.keys]
+            self.values = [v[:, :n] for v in self.values]
+            self.fed = self.fed[:n]
+
+    def sync(self, tokens: list) -> torch.Tensor:
+        """Cache'i tokens ile ortak öneke geri sarar, kalanı besler; son token'ın logit'leri."""
+        common = 0
+        limit = min(len(self.fed), len(tokens) - 1)
+        while common < limit and self.fed[common] == tokens[common]:
+            common += 1
+        self.rollback(common)
+        return self.feed(tokens[common:])[-1]
+
+    def pick(self, tokens: list, logits: torch.Tensor) -> int:
+        """whisper.decode ile aynı logit filtreleri (boş başlangıç, özel token'lar) + argmax."""
+        logits = logits[None].clone()
+        context = torch.tensor([tokens], device=logits.device)
+        for logit_filter in self.task.logit_filters:
+            logit_filter.apply(logits, context)
+        return int(logits.argmax(dim=-1))
+
+
+def _check_compatible(target, draft) -> None:
+    if target.is_multilingual != draft.is_multilingual:
+        raise ValueError("draft and target models must share a vocabulary "
+                         "(both multilingual or both English-only)")
+
+
+def decode(target, audio: np.ndarray, draft=None, language: str = "en",
+           draft_tokens: int = DRAFT_TOKENS) -> dict:
+    """
+    30 sn'ye sığan tek bir kaydı greedy decode eder. draft verilmezse (ya da
+    draft_tokens=0) düz greedy: karşılaştırma için referans.
+    -> {"text", "tokens", "target_passes", "drafted", "accepted"}
+    """
+    if draft is not None:
+        _check_compatible(target, draft)
+    else:
+        draft_tokens = 0
+
+    big = IncrementalDecoder(target, audio, language)
+    small = IncrementalDecoder(draft, audio, language) if draft_tokens else None
+
+    eot = big.tokenizer.eot
+    initial = list(big.task.initial_tokens)
+    max_len = len(initial) + big.task.sample_len
+    stats = {"target_passes": 1, "drafted": 0, "accepted": 0}
+
+    tokens = list(initial)          # kabul edilmiş, büyük modelin cache'inde
+    next_token = big.pick(tokens, big.feed(tokens)[-1])
+    while next_token != eot and len(tokens) < max_len - 1:
+        # taslak: tokens + next_token'dan devam eden k token (metin token id'leri ortak)
+        proposal = []
+        text = tokens[len(initial):] + [next_token]
+        # özel token id'leri modeller arasında kayabilir (large-v3): sadece metin token'larıyla
+        if small is not None and max(text) < eot:
+            k = min(draft_tokens, max_len - len(tokens) - 2)
+            draft_ctx = list(small.task.initial_tokens) + text
+            logits = small.sync(draft_ctx)
+            while len(proposal) < k:
+                guess = small.pick(draft_ctx, logits)
+                if guess >= small.tokenizer.eot:
+                    if guess == small.tokenizer.eot:
+                        proposal.append(eot)
+                    break
+                proposal.append(guess)
+                draft_ctx.append(guess)
+                if len(proposal) < k:
+                    logits = small.feed([guess])[-1]
+            stats["drafted"] += len(proposal)
+
+        # doğrulama: next_token + taslak tek pass'te
+        logits = big.feed([next_token] + proposal)
+        stats["target_passes"] += 1
+        tokens.append(next_token)
+        accepted = 0
+        next_token = big.pick(tokens, logits[0])
+        for i, guess in enumerate(proposal):
+            if guess != next_token or guess == eot:
+                break
+            tokens.append(guess)
+            accepted += 1
+            next_token = big.pick(tokens, logits[i + 1])
+        stats["accepted"] += accepted
+        big.rollback(len(tokens))
+    if next_token != eot:
+        # sample_len doldu: whisper.decode gibi son token da metne girer
+        tokens.append(next_token)
+
+    text_tokens = tokens[len(initial):]
+    return dict(text=big.tokenizer.decode(text_tokens).strip(), tokens=text_tokens, **stats)
+
+
+class SpeculativeModel:
+    """
+    transcribe() arayüzlü sarmalayıcı (transcript_cache / timings ile
+    normal model gibi kullanılır). Sonuç büyük modelin greedy çıktısıdır.
+    """
+
+    def __init__(self, target, draft, draft_tokens: int = DRAFT_TOKENS):
+        _check_compatible(target, draft)
+        self.target = target
+        self.draft = draft
+        self.draft_tokens = draft_tokens
+        # timings.transcribe encoder süresini (büyük modelin) bu modülün hook'larıyla ölçer
+        self.encoder = target.encoder
+
+    @property
+    def device(self):
+        return self.target.device
+
+    def transcribe(self, audio, language: str = "en", **options) -> dict:
+        if isinstance(audio, str):
+            import feature_cache
+            audio = feature_cache.load_pcm(audio, writable=True)
+        if len(audio) > N_SAMPLES:
+            return self.target.transcribe(np.array(audio), language=language, **options)
+        result = decode(self.target, audio, self.draft, language, self.draft_tokens)
+        return {"text": result["text"], "language": language,
+                "speculative": {k: result[k] for k in ("target_passes", "drafted", "accepted")}}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Compare plain greedy decoding with speculative decoding")
+    parser.add_argument("audio", nargs="+")
+    parser.add_argument("--target", default="large")
+    parser.add_argument("--draft", default="base")
+    parser.add_argument("--draft-tokens", type=int, default=DRAFT_TOKENS)
+    parser.add_argument("--device", default=None)
+    args = parser.parse_args(argv)
+
+    import feature_cache
+    from model_registry import get_model
+
+    target = get_model(args.target, device=args.device)
+    draft = get_model(args.draft, device=args.device)
+    report, mismatches = [], 0
+    for path in args.audio:
+        audio = feature_cache.load_pcm(path, writable=True)
+        t0 = time.perf_counter()
+        plain = decode(target, audio)
+        plain_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        spec = decode(target, audio, draft, draft_tokens=args.draft_tokens)
+        spec_s = time.perf_counter() - t0
+        same = plain["tokens"] == spec["tokens"]
+        mismatches += not same
+        report.append({"file": path, "text": spec["text"], "identical": same,
+                       "plain_s": round(plain_s, 3), "speculative_s": round(spec_s, 3),
+                       "speedup": round(plain_s / spec_s, 2),
+                       "target_passes": [plain["target_passes"], spec["target_passes"]],
+                       "acceptance": round(spec["accepted"] / max(spec["drafted"], 1), 3)})
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
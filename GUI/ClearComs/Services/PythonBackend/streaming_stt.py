@@ -0,0 +1,116 @@
+"""
+Konuşma sürerken canlı (kısmi) transkripsiyon.
+
+Mikrofondan gelen 16 kHz bloklar bir buffer'a eklenir; arka plandaki thread
+her PARTIAL_INTERVAL_SECONDS'ta buffer'ın o anki halini Whisper'a verip
+kısmi metni (ve beklenen cümle varsa compare skorunu) bildirir.
+Konuşma durduğu anda (trailing silence başlarken) hemen bir tur daha çözülür;
+kayıt sessizlik yüzünden bittiğinde bu sonuç tüm konuşmayı kapsıyorsa final
+olarak kullanılır, yani final metin için ayrıca tam bir STT turu beklenmez.
+"""
+import threading
+
+import numpy as np
+
+
+PARTIAL_INTERVAL_SECONDS = 0.7
+MIN_PARTIAL_SECONDS = 0.5
+WHISPER_SAMPLE_RATE = 16000
+
+
+class StreamingTranscriber:
+    """
+    feed() ile ses bloklarını alır, on_partial(dict) ile kısmi sonuç yayar,
+    finish() ile final metni döndürür. Model yalnızca tek thread'den kullanılır:
+    finish() önce arka plan thread'ini bekler.
+    """
+
+    def __init__(self, model, expected: str | None = None, compare=None,
+                 on_partial=None, interval: float = PARTIAL_INTERVAL_SECONDS,
+                 language: str = "en"):
+        self.model = model
+        self.expected = expected
+        self.compare = compare
+        self.on_partial = on_partial
+        self.interval = interval
+        self.language = language
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._chunks = []
+        self._n = 0
+        self._speaking = False
+        self._speech_end = 0          # son konuşma bloğunun bittiği sample
+        self._last_n = 0              # son kısmi sonucun kapsadığı sample sayısı
+        self._last_text = None
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def feed(self, audio: np.ndarray, speaking: bool) -> None:
+        """16 kHz float32 blok ekler. speaking=False'a geçiş anında hemen bir tur çözülür."""
+        with self._lock:
+            was_speaking = self._speaking
+            self._chunks.append(np.asarray(audio, dtype=np.float32))
+            self._n += len(audio)
+            if speaking:
+                self._speech_end = self._n
+            self._speaking = speaking
+        if was_speaking and not speaking:
+            self._wake.set()
+
+    def finish(self) -> str:
+        """Kaydı kapatır ve final metni döndürür."""
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+
+        audio, n = self._snapshot()
+        if self._last_text is not None and 0 < self._speech_end <= self._last_n:
+            return self._last_text
+        if n == 0:
+            return ""
+        return self._transcribe(audio)
+
+    # ---------- internals ----------
+    def _snapshot(self):
+        with self._lock:
+            if len(self._chunks) > 1:
+                self._chunks = [np.concatenate(self._chunks)]
+            audio = self._chunks[0] if self._chunks else np.zeros(0, dtype=np.float32)
+            return audio, self._n
+
+    def _transcribe(self, audio: np.ndarray) -> str:
+        result = self.model.transcribe(audio, language=self.language,
+                                       temperature=0.0,
+                                       condition_on_previous_text=False)
+        return result["text"].strip()
+
+    def _run(self) -> None:
+        min_samples = int(MIN_PARTIAL_SECONDS * WHISPER_SAMPLE_RATE)
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._closed:
+                return
+            audio, n = self._snapshot()
+            if n == self._last_n or n < min_samples:
+                continue
+            text = self._transcribe(audio)
+            self._last_n, self._last_text = n, text
+            self._emit(text, n)
+
+    def _emit(self, text: str, n: int) -> None:
+        if self.on_partial is None:
+            return
+        out = {"partial_text": text, "audio_seconds": round(n / WHISPER_SAMPLE_RATE, 2)}
+        if self.expected and self.compare is not None:
+            cmp = self.compare(self.expected, text)
+            out["score"] = cmp["score"]
+            out["passed"] = cmp["passed"]
+        try:
+            self.on_partial(out)
+        except Exception:
+            # UI tarafındaki bir hata kaydı durdurmasın
+            pass
@@ -0,0 +1,42 @@
+"""
+Başlangıç bütçesi: STT gerektirmeyen komutlar (FAST_COMMANDS) torch/whisper
+import etmeden STARTUP_BUDGET_MS içinde hazır olmalı.
+
+    cd GUI/ClearComs/Services/PythonBackend && python -m pytest -q tests
+"""
+import json
+import subprocess
+import sys
+
+import pytest
+
+import communications_backend as backend
+
+
+BACKEND_DIR = backend.BASE_DIR
+
+
+def _run(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=BACKEND_DIR,
+                          capture_output=True, text=True, timeout=600)
+
+
+def test_backend_import_is_lazy():
+    heavy = ["numpy", "torch", "whisper"]
+    proc = _run("-c", "import json, sys, communications_backend; "
+                      f"print(json.dumps([m for m in {heavy!r} if m in sys.modules]))")
+    assert proc.returncode == 0, proc.stderr
+    assert json.loads(proc.stdout) == []
+
+
+def test_fast_commands_within_startup_budget():
+    proc = _run("communications_backend.py", "import-time")
+    report = json.loads(proc.stdout.strip().splitlines()[-1])
+    startup = report["command_startup_ms"]
+    missing = [cmd for cmd in backend.FAST_COMMANDS if startup.get(cmd) is None]
+    if missing:
+        pytest.skip(f"dependencies of {missing} are not importable here")
+    for cmd in backend.FAST_COMMANDS:
+        assert startup[cmd] <= backend.STARTUP_BUDGET_MS, (cmd, startup[cmd])
+    assert report["over_budget"] == []
+    assert proc.returncode == 0
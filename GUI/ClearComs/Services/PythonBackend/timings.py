@@ -0,0 +1,155 @@
+"""
+Aşama (stage) süreleri.
+
+Bir değerlendirmenin nerede yavaşladığını görmek için her aşama
+time.monotonic ile ölçülür: kayıt, ses çözme, Whisper encoder, decode,
+compare_texts, SQLite commit... Zamanlayıcı thread'e bağlı olarak "aktif"
+yapılır; transcript_cache / feature_cache gibi alt katmanlar timings.stage()
+ile kendi aşamalarını ekler, aktif zamanlayıcı yoksa hiçbir şey yapmaz.
+
+    timer = timings.StageTimer()
+    with timer.active():
+        with timer.stage("record"):
+            ...
+    timer.as_ms()   # {"record": 812.4, ..., "total": 1530.2}
+
+Süreler recordings id'si ile timings tablosuna yazılır (create_db.py v4);
+yüzdelik rapor:
+    python communications_backend.py timing-report
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+_local = threading.local()
+
+
+class StageTimer:
+    def __init__(self):
+        self.stages = {}
+        self._start = time.monotonic()
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.monotonic()
+        try:
+            yield self
+        finally:
+            self.add(name, time.monotonic() - t0)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def active(self):
+        """Bu thread'de timings.stage() çağrıları bu zamanlayıcıya yazılsın."""
+        stack = _stack()
+        stack.append(self)
+        try:
+            yield self
+        finally:
+            stack.pop()
+
+    def as_ms(self) -> dict:
+        out = {name: round(s * 1000, 1) for name, s in self.stages.items()}
+        out["total"] = round((time.monotonic() - self._start) * 1000, 1)
+        return out
+
+
+def _stack() -> list:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def current() -> StageTimer | None:
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def stage(name: str):
+    """Aktif zamanlayıcı varsa aşamayı ölçer, yoksa hiçbir şey yapmaz."""
+    timer = current()
+    if timer is None:
+        yield None
+        return
+    with timer.stage(name):
+        yield timer
+
+
+def transcribe(model, audio, **options) -> dict:
+    """
+    model.transcribe; aktif zamanlayıcı varsa süreyi whisper_encoder ve
+    whisper_decode (log-mel + decoder döngüsü) olarak ikiye ayırır.
+    """
+    timer = current()
+    encoder = getattr(model, "encoder", None)
+    if timer is None:
+        return model.transcribe(audio, **options)
+    if encoder is None:
+        with timer.stage("whisper"):
+            return model.transcribe(audio, **options)
+
+    spent = [0.0]
+    started = []
+
+    def sync():
+        if next(encoder.parameters()).is_cuda:
+            import torch
+            torch.cuda.synchronize()
+
+    def before(module, args):
+        sync()
+        started.append(time.monotonic())
+
+    def after(module, args, output):
+        sync()
+        spent[0] += time.monotonic() - started.pop()
+
+    hooks = [encoder.register_forward_pre_hook(before), encoder.register_forward_hook(after)]
+    t0 = time.monotonic()
+    try:
+        return model.transcribe(audio, **options)
+    finally:
+        for h in hooks:
+            h.remove()
+        timer.add("whisper_encoder", spent[0])
+        timer.add("whisper_decode", time.monotonic() - t0 - spent[0])
+
+
+# =========================
+# report
+# =========================
+PERCENTILES = (50, 95, 99)
+
+
+def report(conn, since: float | None = None) -> dict:
+    """
+    Aşama başına adet ve p50/p95/p99 (ms, nearest-rank).
+    since (unix zamanı) verilirse sadece o andan sonraki kayıtlar.
+    """
+    if since is None:
+        stages = conn.execute(
+            "SELECT stage, COUNT(*) FROM timings GROUP BY stage ORDER BY stage").fetchall()
+        source, params = "timings", ()
+    else:
+        source = """(SELECT t.stage, t.ms FROM timings t
+                     JOIN recordings r ON r.id = t.recording_id WHERE r.created_at >= ?)"""
+        params = (since,)
+        stages = conn.execute(
+            f"SELECT stage, COUNT(*) FROM {source} GROUP BY stage ORDER BY stage",
+            params).fetchall()
+
+    out = {}
+    for name, count in stages:
+        row = {"count": count}
+        for p in PERCENTILES:
+            rank = max(0, -(-p * count // 100) - 1)
+            row[f"p{p}"] = conn.execute(
+                f"SELECT ms FROM {source} WHERE stage = ? ORDER BY ms LIMIT 1 OFFSET ?",
+                params + (name, rank)).fetchone()[0]
+        out[name] = row
+    return out
@@ -0,0 +1,162 @@
+"""
+Whisper transkripsiyon cache'i.
+
+Anahtar: (ses içeriğinin sha256'sı, model adı, decode seçenekleri).
+Aynı kayıt aynı modelle tekrar çözülmek istendiğinde Whisper hiç çalışmaz;
+compare_texts değiştiğinde eski kayıtları yeniden puanlamak saniyeler sürer.
+Sonuçlar speech_eval_small.db'nin yanındaki transcript_cache.db'de tutulur,
+MAX_ENTRIES aşılınca en uzun süredir kullanılmayanlar silinir (LRU).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+import timings
+
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "transcript_cache.db")
+MAX_ENTRIES = 20000
+
+
+def audio_sha256(audio) -> str:
+    """Dosya yolu için dosya baytlarının, dizi için float32 PCM'in sha256'sı."""
+    h = hashlib.sha256()
+    if isinstance(audio, str):
+        h.update(b"file:")
+        with open(audio, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    else:
+        h.update(b"pcm16k:")
+        h.update(np.ascontiguousarray(audio, dtype=np.float32).tobytes())
+    return h.hexdigest()
+
+
+def options_key(options: dict) -> str:
+    return json.dumps(options, sort_keys=True, default=str)
+
+
+class TranscriptCache:
+    """SQLite tabanlı, boyutu sınırlı (LRU) transkripsiyon cache'i. Thread-safe."""
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS transcripts (
+            audio_sha256 TEXT NOT NULL,
+            model TEXT NOT NULL,
+            options TEXT NOT NULL,
+            result_json TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL,
+            PRIMARY KEY (audio_sha256, model, options)
+        )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_transcripts_last_used ON transcripts(last_used_at)"
+        )
+        self._conn.commit()
+
+    def get(self, audio_hash: str, model_name: str, options: dict) -> dict | None:
+        key = (audio_hash, model_name, options_key(options))
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result_json FROM transcripts WHERE audio_sha256 = ? AND model = ? AND options = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE transcripts SET last_used_at = ? WHERE audio_sha256 = ? AND model = ? AND options = ?",
+                (time.time(),) + key,
+            )
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, audio_hash: str, model_name: str, options: dict, result: dict) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO transcripts
+                (audio_sha256, model, options, result_json, created_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (audio_hash, model_name, options_key(options),
+                 json.dumps(_jsonable(result), ensure_ascii=False), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        count = self._conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+        extra = count - self.max_entries
+        if extra > 0:
+            self._conn.execute(
+                """
+                DELETE FROM transcripts WHERE rowid IN (
+                    SELECT rowid FROM transcripts ORDER BY last_used_at ASC LIMIT ?
+                )
+                """,
+                (extra,),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _jsonable(result: dict) -> dict:
+    """Whisper sonucu içindeki numpy sayılarını düz Python tiplerine çevirir."""
+    return json.loads(json.dumps(result, default=lambda o: o.item() if hasattr(o, "item") else str(o)))
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_cache() -> TranscriptCache:
+    """Process genelinde paylaşılan cache."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = TranscriptCache()
+        return _default_cache
+
+
+def cached_transcribe(model, model_name: str, audio, cache: TranscriptCache | None = None,
+                      audio_hash: str | None = None, **options) -> dict:
+    """
+    model.transcribe(audio, **options) ile aynı, ama sonuç cache'ten gelebilir.
+    audio: dosya yolu ya da 16 kHz float32 dizi.
+    model: Whisper modeli ya da onu döndüren parametresiz fonksiyon;
+    ikincisinde cache hit olursa model hiç yüklenmez.
+    audio_hash: çağıran audio_sha256(audio)'yu zaten hesapladıysa (örn. DB'ye
+    yazmak için) tekrar hashlenmez.
+    """
+    cache = cache or get_cache()
+    with timings.stage("cache_lookup"):
+        audio_hash = audio_hash or audio_sha256(audio)
+        hit = cache.get(audio_hash, model_name, options)
+    if hit is not None:
+        return hit
+    if not hasattr(model, "transcribe"):
+        with timings.stage("model_load"):
+            model = model()
+    if isinstance(audio, str):
+        # ffmpeg yerine daha önce çözülmüş PCM (bkz. feature_cache)
+        import feature_cache
+        with timings.stage("audio_decode"):
+            audio = feature_cache.load_pcm(audio, audio_hash, writable=True)
+    result = timings.transcribe(model, audio, **options)
+    with timings.stage("cache_store"):
+        cache.put(audio_hash, model_name, options, result)
+    return result
@@ -0,0 +1,131 @@
+"""
+Önceden üretilmiş TTS ses dosyaları.
+
+Her prompt metni (metin, ses, hız) anahtarıyla bir kez WAV'a çevrilir ve
+tts_cache/ klasöründe saklanır; sonraki "Listen" tıklamalarında TTS motoru
+başlatılmadan dosya doğrudan sounddevice ile çalınır.
+
+Tüm prompt'ları önceden üretmek için:
+    python communications_backend.py render_prompts
+"""
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import wave
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, "tts_cache")
+DB_PATH = os.path.join(BASE_DIR, "speech_eval_small.db")
+
+_render_lock = threading.Lock()
+
+
+def cache_key(text: str, voice: str | None, rate: int) -> str:
+    raw = f"{voice or 'default'}|{rate}|{text.strip()}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def cached_path(text: str, voice: str | None, rate: int) -> str:
+    return os.path.join(CACHE_DIR, cache_key(text, voice, rate) + ".wav")
+
+
+def _render_say(text: str, voice: str | None, rate: int, out_path: str) -> None:
+    """macOS: pyttsx3/nsss dosyaya AIFF yazar, say ise doğrudan WAV üretebilir."""
+    cmd = ["say", "-o", out_path, "--data-format=LEI16@22050", "-r", str(rate)]
+    if voice:
+        cmd += ["-v", voice.rsplit(".", 1)[-1]]
+    subprocess.run(cmd + [text], check=True)
+
+
+def _render_pyttsx3(text: str, voice: str | None, rate: int, out_path: str) -> None:
+    import pyttsx3
+
+    engine = pyttsx3.init()
+    if voice:
+        try:
+            engine.setProperty("voice", voice)
+        except Exception:
+            pass
+    engine.setProperty("rate", rate)
+    engine.save_to_file(text, out_path)
+    engine.runAndWait()
+
+
+def render(text: str, voice: str | None, rate: int) -> str:
+    """Metni (cache'te yoksa) WAV'a çevirir, dosya yolunu döndürür."""
+    path = cached_path(text, voice, rate)
+    if os.path.exists(path):
+        return path
+
+    with _render_lock:
+        if os.path.exists(path):
+            return path
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".wav", dir=CACHE_DIR)
+        os.close(fd)
+        try:
+            if sys.platform == "darwin" and shutil.which("say"):
+                _render_say(text, voice, rate, tmp_path)
+            else:
+                _render_pyttsx3(text, voice, rate, tmp_path)
+            # bozuk / boş dosya cache'e girmesin
+            with wave.open(tmp_path, "rb") as w:
+                if w.getframerate() <= 0 or w.getnframes() == 0:
+                    raise RuntimeError("TTS render produced no audio")
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return path
+
+
+def play(path: str) -> None:
+    """
+    PCM WAV'ı RawOutputStream ile çalar; numpy/scipy import edilmez,
+    böylece play_prompt hızlı açılır.
+    """
+    import sounddevice as sd
+
+    with wave.open(path, "rb") as w:
+        samplerate = w.getframerate()
+        channels = w.getnchannels()
+        if w.getsampwidth() != 2:
+            raise ValueError(f"unsupported sample width: {w.getsampwidth()}")
+        frames = w.readframes(w.getnframes())
+
+    with sd.RawOutputStream(samplerate=samplerate, channels=channels, dtype="int16") as stream:
+        stream.write(frames)
+
+
+def speak_cached(text: str, voice: str | None, rate: int) -> str:
+    """Metni cache'ten çalar (gerekirse önce üretir)."""
+    path = render(text, voice, rate)
+    play(path)
+    return path
+
+
+def render_all(voice: str | None, rate: int, db_path: str = DB_PATH) -> dict:
+    """prompts tablosundaki tüm cümleleri önceden üretir."""
+    import db
+    rows = db.get_connection(db_path).execute(
+        "SELECT id, expected_text FROM prompts ORDER BY id").fetchall()
+
+    rendered, cached, failed = 0, 0, []
+    for prompt_id, text in rows:
+        if not text:
+            continue
+        if os.path.exists(cached_path(text, voice, rate)):
+            cached += 1
+            continue
+        try:
+            render(text, voice, rate)
+            rendered += 1
+        except Exception as e:
+            failed.append({"prompt_id": prompt_id, "error": str(e)})
+    return {"rendered": rendered, "already_cached": cached, "failed": failed}
+
@@ -0,0 +1,128 @@
+"""
+Whisper micro-batch inference.
+
+Birden fazla kısa kaydın log-mel spektrogramları tek bir tensörde birleştirilir,
+encoder tek forward pass'te çalışır ve hepsi birlikte (greedy) decode edilir.
+30 saniyeden uzun kayıtlar tek pencereye sığmadığı için normal
+model.transcribe() yoluna düşer.
+"""
+import numpy as np
+import torch
+import whisper
+from whisper.audio import N_SAMPLES
+
+import feature_cache
+import transcript_cache
+
+
+def load_audio_array(audio, audio_hash: str | None = None) -> np.ndarray:
+    """Dosya yolu (feature_cache üzerinden) ya da 16 kHz float32 dizi kabul eder."""
+    if isinstance(audio, str):
+        return feature_cache.load_pcm(audio, audio_hash)
+    return np.asarray(audio, dtype=np.float32)
+
+
+def log_mel(model, audio: np.ndarray) -> torch.Tensor:
+    """30 sn'ye pad'lenmiş log-mel spektrogram (n_mels, 3000)."""
+    return whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=model.dims.n_mels)
+
+
+def _mel_for(model, source, audio: np.ndarray, audio_hash: str | None) -> torch.Tensor:
+    """Dosyalar için log-mel feature_cache'ten gelir; diziler için hesaplanır."""
+    if isinstance(source, str):
+        mel = feature_cache.load_mel(source, model.dims.n_mels, audio_hash)
+        return torch.from_numpy(np.array(mel))
+    return log_mel(model, audio)
+
+
+def audio_features(model, audio, audio_hash: str | None = None) -> torch.Tensor:
+    """
+    Tek bir kaydın encoder çıktısı (1, n_audio_ctx, n_audio_state).
+    Teacher-forced puanlama (prompt_scoring) decoder'ı bunun üzerinde çalıştırır.
+    """
+    array = load_audio_array(audio, audio_hash)
+    mel = _mel_for(model, audio, array, audio_hash)
+    dtype = next(model.encoder.parameters()).dtype
+    with torch.no_grad():
+        return model.embed_audio(mel[None].to(model.device, dtype))
+
+
+def decoding_options(model, language: str = "en") -> whisper.DecodingOptions:
+    return whisper.DecodingOptions(language=language,
+                                   without_timestamps=True,
+                                   fp16=model.device.type != "cpu")
+
+
+def transcribe_batch(model, audios, language: str = "en",
+                     model_name: str | None = None, cache=None,
+                     return_hashes: bool = False):
+    """
+    audios: dosya yolları ve/veya 16 kHz float32 diziler.
+    Sonuç metinleri girişlerle aynı sırada döner. Çözülemeyen bir dosya
+    tüm batch'i düşürmesin diye o elemanın yerine exception nesnesi konur;
+    toplu decode hata verirse kayıtlar tek tek decode edilir.
+    cache (transcript_cache.TranscriptCache) ve model_name verilirse cache'te
+    olan kayıtlar batch'e hiç girmez.
+    return_hashes=True ise (metinler, audio_sha256 listesi) döner; hash'ler
+    zaten bu thread'de hesaplandığı için çağıranın tekrar okuması gerekmez
+    (okunamayan kayıt için None).
+    """
+    texts = [None] * len(audios)
+    hashes = {}
+    options = {"language": language, "decoder": "batch_greedy"}
+    use_cache = cache is not None and model_name
+    if use_cache or return_hashes:
+        for i, a in enumerate(audios):
+            try:
+                hashes[i] = transcript_cache.audio_sha256(a)
+            except OSError as e:
+                texts[i] = e
+                continue
+            if not use_cache:
+                continue
+            hit = cache.get(hashes[i], model_name, options)
+            if hit is not None:
+                texts[i] = hit["text"]
+
+    arrays = {}
+    for i, a in enumerate(audios):
+        if texts[i] is not None:
+            continue
+        try:
+            arrays[i] = load_audio_array(a, hashes.get(i))
+        except Exception as e:
+            texts[i] = e
+
+    mels = {}
+    for i, a in arrays.items():
+        try:
+            if len(a) > N_SAMPLES:
+                texts[i] = model.transcribe(np.array(a), language=language)["text"]
+            else:
+                mels[i] = _mel_for(model, audios[i], a, hashes.get(i))
+        except Exception as e:
+            texts[i] = e
+
+    if mels:
+        decode_opts = decoding_options(model, language)
+        try:
+            results = whisper.decode(model, torch.stack(list(mels.values())).to(model.device),
+                                     decode_opts)
+            for i, res in zip(mels, results):
+                texts[i] = res.text
+        except Exception:
+            # batch'i düşüren kaydı bulmak için tek tek
+            for i, mel in mels.items():
+                try:
+                    texts[i] = whisper.decode(model, mel.to(model.device), decode_opts).text
+                except Exception as e:
+                    texts[i] = e
+
+    if use_cache:
+        for i in arrays:
+            if i in hashes and isinstance(texts[i], str):
+                cache.put(hashes[i], model_name, options, {"text": texts[i]})
+
+    if return_hashes:
+        return texts, [hashes.get(i) for i in range(len(audios))]
+    return texts
@@ -28,6 +28,7 @@ namespace ClearComs.ViewModels
         public CommunicationTrainerViewModel()
         {
             _backend = new PythonBackendService();
+            _backend.PartialResultReceived += OnPartialResult;
 
             PlayPromptCommand = new AsyncRelayCommand(OnPlayPromptAsync);
             RecordCommand = new AsyncRelayCommand(OnRecordAsync);
@@ -65,30 +66,41 @@ namespace ClearComs.ViewModels
         }
 
 
+        private void OnPartialResult(Dictionary<string, object> partial)
+        {
+            string text = partial.TryGetValue("partial_text", out var textObj) && textObj != null
+                ? textObj.ToString() ?? ""
+                : "";
+
+            string score = partial.TryGetValue("score", out var scoreObj) && scoreObj != null
+                ? scoreObj.ToString() ?? ""
+                : "";
+
+            // backend thread'inden geliyor, UI thread'ine taşı
+            MainThread.BeginInvokeOnMainThread(() =>
+            {
+                if (!IsProcessing)
+                    return;
+                FeedbackText = string.IsNullOrWhiteSpace(score)
+                    ? $"Hearing: {text}"
+                    : $"Hearing: {text}\n(Score so far: {score})";
+            });
+        }
+
         private async Task OnRecordAsync()
         {
             // UI: butonları kilitle
             IsProcessing = true;
 
             // 1) Python komutunu arka planda başlat (hemen await ETME)
-            var backendTask = _backend.RunBackendAsync("record_and_evaluate", _currentPromptId);
-
-            // 2) Kullanıcıya aşamaları göster
-            FeedbackText = "Preparing microphone...";
-
-            // Tahminen ~2 saniye hazırlık süresi
-            await Task.Delay(2000);
-
-            // 3) Kayıt başladı info
-            FeedbackText = "Recording (about 5 seconds)... Speak now!";
-
-            // Kullanıcıya 5 saniyelik kayıt süresi hissi ver
-            await Task.Delay(5000);
+            var backendTask = _backend.RunBackendAsync("record_and_evaluate", _currentPromptId, stream: true);
 
-            // 4) Değerlendirme aşaması
-            FeedbackText = "Evaluating your speech...";
+            // 2) Kayıt başladı info
+            // Backend konuşma bitince (sessizlikte) kaydı kendisi durduruyor,
+            // bu yüzden sabit 5 saniye beklemiyoruz.
+            FeedbackText = "Recording... Speak now! (stops when you finish)";
 
-            // 5) Artık Python'un işini bitirmesini bekliyoruz
+            // 3) Python'un işini bitirmesini bekliyoruz
             var result = await backendTask;
 
             IsProcessing = false;